@@ -0,0 +1,197 @@
+"""
+   Archival of finished sessions.
+
+   Sessions older than the retention window move, together with their
+   registrations, audit rows and cancellations, to *_history tables of
+   the same shape. Each batch is one short transaction that copies and then
+   deletes a few hundred sessions, so hot tables stay the size of the current
+   term and an interrupted run simply resumes with the next batch. The same
+   run prunes expired "My Schedule" rows and idempotency keys, so the app
+   itself does no housekeeping at startup.
+
+   Usage: python archive.py [--days 30] [--batch 500]
+"""
+import argparse
+import datetime
+import sys
+import time
+
+from mysql.connector import Error
+
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_BATCH_SIZE = 500
+PAST_SESSIONS_LIMIT = 50
+
+# (hot table, history table, columns copied or None for all); rows
+# referencing sessions come first so they are deleted before the sessions
+# they point at. session_changes_history was backfilled with its own
+# change_ids (migration 11), so change rows get fresh IDs there.
+ARCHIVED_TABLES = [
+    ('registrations', 'registrations_history', None),
+    ('session_updates', 'session_updates_history', None),
+    ('session_changes', 'session_changes_history', 'session_id, changed_at, changes'),
+    ('cancellations', 'cancellations_history', None),
+    ('sessions', 'sessions_history', None),
+]
+
+# Per-session rows that are only meaningful while the session is upcoming
+DISCARDED_TABLES = ['student_schedule', 'session_waitlist']
+
+# (sessions table, registrations table) read together by the past-session views
+PAST_SESSION_SOURCES = [
+    ('sessions', 'registrations'),
+    ('sessions_history', 'registrations_history'),
+]
+
+PAST_SESSION_COLUMNS = '''
+    s.session_id, s.subject, s.topic, s.level, s.date, s.start_time,
+    s.end_time, s.duration, s.mode, s.status, t.name AS tutor_name
+'''
+
+
+def archive_cutoff(days=ARCHIVE_AFTER_DAYS):
+    """Returns the first date that stays in the hot tables"""
+    return datetime.date.today() - datetime.timedelta(days=days)
+
+
+def archive_candidates_query(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """(query, params) locking the oldest sessions dated before cutoff"""
+    # SKIP LOCKED lets two archivers (or a tutor editing an old session)
+    # work side by side instead of queueing behind each other
+    return '''
+        SELECT session_id FROM sessions
+        WHERE date < %s
+        ORDER BY date
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ''', (cutoff, batch_size)
+
+
+def archive_batch(cursor, cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Moves up to batch_size sessions dated before cutoff to history; returns their IDs"""
+    cursor.execute(*archive_candidates_query(cutoff, batch_size))
+    session_ids = [row[0] for row in cursor.fetchall()]
+    if not session_ids:
+        return session_ids
+
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    # Derived rows are not kept once the session is over
+    for table in DISCARDED_TABLES:
+        cursor.execute(f"DELETE FROM {table} WHERE session_id IN ({placeholders})", session_ids)
+
+    for table, history, columns in ARCHIVED_TABLES:
+        # A plain INSERT: a key collision aborts the whole batch instead of
+        # skipping the row and then deleting it from the hot table
+        if columns:
+            copy = (f"INSERT INTO {history} ({columns}) "
+                    f"SELECT {columns} FROM {table} WHERE session_id IN ({placeholders})")
+        else:
+            copy = f"INSERT INTO {history} SELECT * FROM {table} WHERE session_id IN ({placeholders})"
+        cursor.execute(copy, session_ids)
+        cursor.execute(f"DELETE FROM {table} WHERE session_id IN ({placeholders})", session_ids)
+
+    return session_ids
+
+
+def archive_sessions(system, days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, pause=0.0):
+    """Archives every session older than `days`, one transaction per batch; returns how many moved"""
+    cutoff = archive_cutoff(days)
+    moved = 0
+    while True:
+        session_ids = system.run_transaction(lambda cursor: archive_batch(cursor, cutoff, batch_size))
+        moved += len(session_ids)
+        if len(session_ids) < batch_size:
+            return moved
+        # Optional breather so replicas and concurrent writers keep up
+        if pause:
+            time.sleep(pause)
+
+
+def past_sessions_for_student_query(student_id, limit=PAST_SESSIONS_LIMIT):
+    """(query, params) reading the student's most recent past sessions from hot and history tables"""
+    branches = []
+    params = []
+    for sessions, registrations in PAST_SESSION_SOURCES:
+        branches.append(f'''
+            SELECT {PAST_SESSION_COLUMNS}
+            FROM {registrations} r
+            JOIN {sessions} s ON s.session_id = r.session_id
+            JOIN tutors t ON t.tutor_id = s.tutor_id
+            WHERE r.student_id = %s AND r.status = 'registered' AND s.date < CURDATE()
+        ''')
+        # Sessions created from a request register their participants, so
+        # registrations alone cover them, cancellations included
+        params.append(student_id)
+
+    return _past_query(branches, params, limit)
+
+
+def past_sessions_for_tutor_query(tutor_id, limit=PAST_SESSIONS_LIMIT):
+    """(query, params) reading the tutor's most recent past sessions from hot and history tables"""
+    branches = []
+    params = []
+    for sessions, _ in PAST_SESSION_SOURCES:
+        branches.append(f'''
+            SELECT {PAST_SESSION_COLUMNS}
+            FROM {sessions} s
+            JOIN tutors t ON t.tutor_id = s.tutor_id
+            WHERE s.tutor_id = %s AND s.date < CURDATE()
+        ''')
+        params.append(tutor_id)
+
+    return _past_query(branches, params, limit)
+
+
+def _past_query(branches, params, limit):
+    """The UNION of the branches newest first"""
+    return (" UNION ".join(f"({branch})" for branch in branches)
+            + " ORDER BY date DESC, start_time DESC LIMIT %s"), params + [limit]
+
+
+def fetch_past_sessions_for_student(connection, student_id, limit=PAST_SESSIONS_LIMIT):
+    """Returns the student's most recent past sessions from both hot and history tables"""
+    return _fetch_past(connection, *past_sessions_for_student_query(student_id, limit))
+
+
+def fetch_past_sessions_for_tutor(connection, tutor_id, limit=PAST_SESSIONS_LIMIT):
+    """Returns the tutor's most recent past sessions from both hot and history tables"""
+    return _fetch_past(connection, *past_sessions_for_tutor_query(tutor_id, limit))
+
+
+def _fetch_past(connection, query, params):
+    """Runs a past-session query on a dictionary cursor"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def print_past_session(session):
+    """Prints one row returned by the past-session queries"""
+    print(f"\n{session['date']} {session['start_time']}-{session['end_time']} | "
+          f"{session['subject']} - {session['topic']} ({session['level']})")
+    print(f"Tutor: {session['tutor_name']} | Mode: {session['mode']} | Status: {session['status']}")
+
+
+if __name__ == "__main__":
+    from main import TutoringSystem
+
+    parser = argparse.ArgumentParser(description="Move finished sessions to the history tables")
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help="keep this many past days hot")
+    parser.add_argument('--batch', type=int, default=ARCHIVE_BATCH_SIZE, help="sessions moved per transaction")
+    parser.add_argument('--pause', type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    try:
+        system = TutoringSystem()
+        moved = archive_sessions(system, args.days, args.batch, args.pause)
+        system.prune_expired_schedule()
+        system.prune_idempotency_keys()
+    except Error as e:
+        # Completed batches stay archived; the next run picks up where this one stopped
+        print(f"Archiving stopped: {e}")
+        sys.exit(2)
+
+    print(f"Archived {moved} session(s) dated before {archive_cutoff(args.days)}.")
@@ -0,0 +1,159 @@
+"""
+   Compact change log for session edits.
+
+   Every tutor edit becomes one session_changes row whose `changes` column is
+   a JSON object {field: [old, new]}, with dates, times and numbers kept as
+   typed JSON values instead of free text. Rows are written either inside
+   the edit's own transaction or, when enabled, by AuditWriter on a
+   background thread that batches many edits into one multi-row INSERT.
+"""
+import datetime
+import json
+import queue
+import threading
+
+from mysql.connector import Error
+
+from timemodel import format_minutes, to_minutes
+
+INT_FIELDS = {'duration', 'capacity'}
+
+# Hot and archived change logs, read together when rebuilding a history
+CHANGE_TABLES = ['session_changes', 'session_changes_history']
+
+
+def _json_value(field, value):
+    """Converts a column value to the JSON type stored in the diff"""
+    if value is None:
+        return None
+    if field in INT_FIELDS:
+        return int(value)
+    if isinstance(value, (datetime.timedelta, datetime.time)):
+        return format_minutes(to_minutes(value))
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+def build_diff(session, updates):
+    """Returns {field: [old, new]} for the fields whose value actually changes"""
+    diff = {}
+    for field, new_value in updates.items():
+        old = _json_value(field, session.get(field))
+        new = _json_value(field, new_value)
+        if old != new:
+            diff[field] = [old, new]
+    return diff
+
+
+def change_row(session_id, diff, changed_at=None):
+    """Returns the (session_id, changed_at, changes) parameters for one log row"""
+    return (session_id, changed_at or datetime.datetime.now(), json.dumps(diff, sort_keys=True))
+
+
+def write_changes(cursor, rows):
+    """Writes change rows with a single multi-row INSERT"""
+    if not rows:
+        return
+    cursor.executemany('''
+        INSERT INTO session_changes (session_id, changed_at, changes)
+        VALUES (%s, %s, %s)
+    ''', rows)
+
+
+def session_history_query(session_id):
+    """(query, params) reading a session's change rows from the hot and history tables, oldest first"""
+    return " UNION ALL ".join(
+        f"(SELECT change_id, changed_at, changes FROM {table} WHERE session_id = %s)"
+        for table in CHANGE_TABLES
+    ) + " ORDER BY changed_at, change_id", [session_id] * len(CHANGE_TABLES)
+
+
+def fetch_session_history(connection, session_id):
+    """Returns [{'changed_at', 'changes': {field: [old, new]}}] for a session, oldest first"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(*session_history_query(session_id))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    return [
+        {'changed_at': row['changed_at'], 'changes': json.loads(row['changes'])}
+        for row in rows
+    ]
+
+
+def session_as_of(current, history, when):
+    """Rebuilds a session's fields as they were at `when` by undoing later changes"""
+    session = dict(current)
+    for entry in reversed(history):
+        if entry['changed_at'] <= when:
+            break
+        for field, (old, _) in entry['changes'].items():
+            session[field] = old
+    return session
+
+
+class AuditWriter:
+    """Background thread that flushes queued change rows in multi-row batches.
+
+    The tutor's edit commits without waiting for its audit row. Rows still
+    queued when the process dies are lost, so this is opt-in through
+    TutoringSystem.get_audit_config().
+    """
+
+    def __init__(self, transactions, batch_size=200, flush_interval=0.5):
+        self.transactions = transactions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._written = 0
+        self._failed = 0
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, session_id, diff):
+        """Queues one edit for the next batch"""
+        self._queue.put(change_row(session_id, diff))
+
+    def _drain(self, first):
+        """Collects up to batch_size queued rows, starting with `first`"""
+        rows = [first]
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, rows):
+        """Writes one batch, counting (and reporting) rows that could not be written"""
+        try:
+            self.transactions.run(lambda cursor: write_changes(cursor, rows))
+            self._written += len(rows)
+        except Error as e:
+            self._failed += len(rows)
+            print(f"Audit writer dropped {len(rows)} change(s): {e}")
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._flush(self._drain(first))
+
+    def close(self):
+        """Flushes everything still queued and stops the thread"""
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        """Returns queued/written/failed row counters"""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self._written,
+            'failed': self._failed,
+        }
@@ -0,0 +1,88 @@
+"""
+   Catalog search benchmark.
+
+   Usage: python -m benchmarks.bench_catalog_search [--seed 100000] [--repeat 50] [--depth 10000]
+
+   Seeds tms_bench (optional) and times fetch_catalog_page for each filter,
+   alone and combined, and for pages --depth rows into the catalog, against
+   the 50 ms target.
+"""
+import argparse
+import datetime
+import sys
+
+from benchmarks.common import BenchSystem, percentile, seed_catalog, summarize, time_call
+from services import fetch_catalog_page
+
+TARGET_MS = 50
+
+CASES = [
+    ('first page, no filters', {}),
+    ('subject', {'subject': 'Physics'}),
+    ('topic prefix', {'topic': 'Calc'}),
+    ('level', {'level': 'Advanced'}),
+    ('mode', {'mode': 'Online'}),
+    ('level + mode', {'level': 'Advanced', 'mode': 'Online'}),
+    ('tutor name prefix', {'tutor': 'Bonane'}),
+    ('date range (one week)', {
+        'date_from': (datetime.date.today() + datetime.timedelta(days=30)).isoformat(),
+        'date_to': (datetime.date.today() + datetime.timedelta(days=37)).isoformat(),
+    }),
+    ('free text', {'text': 'thermodynamics examples'}),
+    ('subject + level + text', {'subject': 'Math', 'level': 'Beginner', 'text': 'calculus'}),
+]
+
+# Deep pages: the keyset seek should cost the same as the first page
+DEEP_CASES = [
+    ('no filters', {}),
+    ('subject', {'subject': 'Physics'}),
+    ('level', {'level': 'Advanced'}),
+]
+
+
+def key_after(connection, depth, filters):
+    """Returns the keyset key of row number `depth` of a filtered catalog, or None"""
+    rows, _ = fetch_catalog_page(connection, page_size=depth, filters=filters)
+    if len(rows) < depth:
+        return None
+    last = rows[-1]
+    return last['date'], last['start_time'], last['session_id']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0, help="sessions to insert before measuring")
+    parser.add_argument('--repeat', type=int, default=50, help="timed runs per case")
+    parser.add_argument('--depth', type=int, default=10000, help="rows to skip for the deep-page cases")
+    args = parser.parse_args()
+
+    system = BenchSystem()
+    if args.seed:
+        print(f"Seeding {args.seed} sessions into tms_bench...")
+        seed_catalog(system, args.seed)
+
+    failed = False
+    with system.get_connection() as connection:
+        for name, filters in CASES:
+            timings = time_call(lambda: fetch_catalog_page(connection, filters=filters), args.repeat)
+            print(summarize(name, timings))
+            if percentile(timings, 95) > TARGET_MS:
+                failed = True
+
+        for name, filters in DEEP_CASES:
+            after = key_after(connection, args.depth, filters)
+            if after is None:
+                print(f"{name}: fewer than {args.depth} rows, deep page skipped")
+                continue
+            timings = time_call(lambda: fetch_catalog_page(connection, after, filters=filters), args.repeat)
+            print(summarize(f'{name}, page after {args.depth} rows', timings))
+            if percentile(timings, 95) > TARGET_MS:
+                failed = True
+
+    print(f"\nTarget: p95 under {TARGET_MS} ms -> {'FAIL' if failed else 'PASS'}")
+    system.pool.close_all()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
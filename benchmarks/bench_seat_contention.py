@@ -0,0 +1,125 @@
+"""
+   Seat contention benchmark.
+
+   Usage: python -m benchmarks.bench_seat_contention [--students 500] [--seats 100] [--threads 32] [--waitlist]
+
+   Creates one session with `--seats` seats in tms_bench and lets `--students`
+   students register for it at the same time from `--threads` connections,
+   the way term registration opens. Each attempt goes through
+   services.register_for_sessions (and services.join_waitlists with
+   `--waitlist`), the same path the student menu uses. Reports throughput,
+   latency percentiles and fails if the session is ever oversold.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import BenchSystem, percentile, summarize
+import services
+
+SESSION_ID = 'sess_bseat'
+TUTOR_ID = 'ttr_bseat'
+
+
+class ContentionSystem(BenchSystem):
+    """BenchSystem with one pooled connection per worker thread"""
+
+    threads = 32
+
+    def get_pool_config(self):
+        config = super().get_pool_config()
+        config['size'] = self.threads
+        config['timeout'] = 60
+        return config
+
+
+def reset_session(system, students, seats):
+    """(Re)creates the benchmark session and students with no registrations"""
+    with system.get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "INSERT IGNORE INTO tutors (tutor_id, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+                (TUTOR_ID, 'Seat Bench', 'seats@bench.io', '0' * 64)
+            )
+            cursor.executemany(
+                "INSERT IGNORE INTO students (student_id, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+                [(f"st_bseat{i:05d}", f"Student {i}", f"s{i}@seats.io", '0' * 64) for i in range(students)]
+            )
+            cursor.execute('''
+                INSERT INTO sessions (
+                    session_id, tutor_id, subject, topic, level, details,
+                    date, start_time, duration, end_time, mode, status, location, capacity)
+                VALUES (%s, %s, 'Math', 'Calculus', 'Beginner', 'Seat benchmark',
+                        CURDATE() + INTERVAL 7 DAY, '10:00', 60, '11:00', 'In-person', 'active', 'Hall A', %s)
+                ON DUPLICATE KEY UPDATE capacity = VALUES(capacity), registration_count = 0
+            ''', (SESSION_ID, TUTOR_ID, seats))
+            for table in ('student_schedule', 'session_waitlist', 'cancellations', 'registrations'):
+                cursor.execute(f"DELETE FROM {table} WHERE session_id = %s", (SESSION_ID,))
+            cursor.execute("UPDATE sessions SET registration_count = 0 WHERE session_id = %s", (SESSION_ID,))
+            connection.commit()
+        finally:
+            cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=500, help="students registering at once")
+    parser.add_argument('--seats', type=int, default=100, help="capacity of the session")
+    parser.add_argument('--threads', type=int, default=32, help="concurrent connections")
+    parser.add_argument('--waitlist', action='store_true', help="put students who miss out on the waitlist")
+    args = parser.parse_args()
+
+    ContentionSystem.threads = args.threads
+    system = ContentionSystem()
+    reset_session(system, args.students, args.seats)
+
+    def attempt(i):
+        student_id = f"st_bseat{i:05d}"
+        started = time.perf_counter()
+        result = services.register_for_sessions(system, student_id, [SESSION_ID])[SESSION_ID]
+        if result == 'full' and args.waitlist:
+            if services.join_waitlists(system, student_id, [SESSION_ID])[SESSION_ID]:
+                result = 'waitlisted'
+        return result, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        outcomes = list(executor.map(attempt, range(args.students)))
+    elapsed = time.perf_counter() - started
+
+    timings = [ms for _, ms in outcomes]
+    counts = {}
+    for result, _ in outcomes:
+        counts[result] = counts.get(result, 0) + 1
+
+    with system.get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('''
+                SELECT s.registration_count,
+                       (SELECT COUNT(*) FROM registrations r
+                        WHERE r.session_id = s.session_id AND r.status = 'registered')
+                FROM sessions s WHERE s.session_id = %s
+            ''', (SESSION_ID,))
+            stored, actual = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    print(summarize(f"{args.students} students / {args.threads} threads", timings))
+    print(f"Throughput: {args.students / elapsed:.0f} registrations attempted per second "
+          f"({elapsed:.2f} s total), p99 {percentile(timings, 99):.2f} ms")
+    print("Outcomes: " + ', '.join(f"{result}={count}" for result, count in sorted(counts.items())))
+    print(f"Seats: capacity {args.seats}, counter {stored}, registrations {actual}")
+    stats = system.transaction_stats()
+    print(f"Transactions: {stats['committed']} committed, {stats['retries']} retried, {stats['aborted']} aborted")
+
+    oversold = actual > args.seats or stored != actual or counts.get('registered', 0) != min(args.seats, args.students)
+    print(f"\nCorrectness -> {'FAIL' if oversold else 'PASS'}")
+    system.pool.close_all()
+    sys.exit(1 if oversold else 0)
+
+
+if __name__ == "__main__":
+    main()
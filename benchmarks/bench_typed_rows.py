@@ -0,0 +1,108 @@
+"""
+   Typed row benchmark.
+
+   Usage: python -m benchmarks.bench_typed_rows [--seed 20000] [--rows 10000] [--repeat 20]
+
+   Reads the same `--rows` catalog rows through a dictionary cursor (the old
+   listing path) and as Session records through a raw tuple cursor, and
+   reports the time to fetch them, the time to fetch and read every field
+   the catalog prints, and the memory the fetched rows keep alive, all
+   scaled to 10k rows.
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from benchmarks.common import BenchSystem, seed_catalog, summarize, time_call
+from records import Session, fetch_records
+
+PER_ROWS = 10000
+
+# What the catalog page prints for every session
+SHOWN_FIELDS = ['subject', 'topic', 'date', 'start_time', 'end_time', 'duration', 'mode',
+                'tutor_name', 'tutor_email', 'location', 'online_link', 'details', 'capacity']
+
+
+def catalog_query(rows):
+    return f'''
+        SELECT {Session.columns()}
+        FROM sessions s
+        JOIN tutors t ON s.tutor_id = t.tutor_id
+        WHERE s.status = 'active'
+        ORDER BY s.date, s.start_time, s.session_id
+        LIMIT {int(rows)}
+    '''
+
+
+def fetch_dicts(connection, query):
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(query)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def fetch_typed(connection, query):
+    return fetch_records(connection, Session, query)
+
+
+def read_shown(rows):
+    for row in rows:
+        for field in SHOWN_FIELDS:
+            row[field]
+
+
+def retained_bytes(fetch):
+    """Bytes still allocated after fetch() returns, i.e. what the rows themselves cost"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    rows = fetch()
+    read_shown(rows)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seed', type=int, default=0, help="sessions to insert before measuring")
+    parser.add_argument('--rows', type=int, default=PER_ROWS, help="rows read per run")
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per case")
+    args = parser.parse_args()
+
+    system = BenchSystem()
+    if args.seed:
+        print(f"Seeding {args.seed} sessions into tms_bench...")
+        seed_catalog(system, args.seed)
+
+    query = catalog_query(args.rows)
+    paths = [('dict cursor', fetch_dicts), ('typed records', fetch_typed)]
+    with system.get_connection() as connection:
+        fetched = len(fetch_dicts(connection, query))
+        if not fetched:
+            print("No sessions in tms_bench; run with --seed first.")
+            system.pool.close_all()
+            sys.exit(1)
+        scale = PER_ROWS / fetched
+        print(f"{fetched} rows per run, figures scaled to {PER_ROWS} rows\n")
+
+        memory = {}
+        for name, fetch in paths:
+            timings = time_call(lambda: fetch(connection, query), args.repeat)
+            print(summarize(f"{name}: fetch", [ms * scale for ms in timings]))
+            timings = time_call(lambda: read_shown(fetch(connection, query)), args.repeat)
+            print(summarize(f"{name}: fetch + read shown", [ms * scale for ms in timings]))
+            memory[name] = retained_bytes(lambda: fetch(connection, query)) * scale
+
+    print()
+    for name, size in memory.items():
+        print(f"{name:<32} {size / 1024 / 1024:8.2f} MiB retained per {PER_ROWS} rows")
+    print(f"Typed records use {memory['typed records'] / memory['dict cursor']:.0%} of the dict cursor's memory")
+    system.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
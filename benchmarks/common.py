@@ -0,0 +1,100 @@
+"""
+   Shared helpers for the benchmark scripts.
+
+   Benchmarks run against a separate `tms_bench` database so seeding test
+   data never touches the real `tms` database.
+"""
+import random
+import statistics
+import time
+
+from main import TutoringSystem
+
+SUBJECTS = ['Math', 'Physics', 'Chemistry', 'Biology', 'History', 'Programming', 'English', 'Economics']
+TOPICS = ['Calculus', 'Algebra', 'Kinematics', 'Thermodynamics', 'Organic reactions', 'Genetics',
+          'World war', 'Recursion', 'Databases', 'Essay writing', 'Microeconomics', 'Statistics']
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+MODES = ['Online', 'In-person']
+NAMES = ['Alice', 'Bonane', 'Rhoda', 'Fabrice', 'Maxime', 'Muhammed', 'Nyiramanzi', 'Grace', 'Eric', 'Diane']
+
+
+class BenchSystem(TutoringSystem):
+    """TutoringSystem pointed at the benchmark database"""
+
+    def get_db_config(self):
+        config = super().get_db_config()
+        config['database'] = 'tms_bench'
+        return config
+
+
+def percentile(samples, pct):
+    """Returns the pct-th percentile of the samples"""
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def time_call(func, repeat):
+    """Runs func `repeat` times and returns the timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(name, timings_ms):
+    """Formats median/p95/p99/max for a list of timings"""
+    return (f"{name:<32} median {statistics.median(timings_ms):8.2f} ms | "
+            f"p95 {percentile(timings_ms, 95):8.2f} ms | p99 {percentile(timings_ms, 99):8.2f} ms | "
+            f"max {max(timings_ms):8.2f} ms")
+
+
+def seed_catalog(system, sessions, tutors=500, days=180, batch=1000):
+    """Fills tms_bench with `tutors` tutors and `sessions` upcoming active sessions"""
+    rng = random.Random(42)
+
+    with system.get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(
+                "INSERT IGNORE INTO tutors (tutor_id, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+                [(f"ttr_b{i:05d}", f"{rng.choice(NAMES)} {i}", f"t{i}@bench.io", '0' * 64)
+                 for i in range(tutors)]
+            )
+            connection.commit()
+
+            rows = []
+            for i in range(sessions):
+                # Enumerate (tutor, day, slot) so unique_session_time never collides
+                tutor = i % tutors
+                day = (i // tutors) % days + 1
+                slot = i // (tutors * days)
+                start = 8 * 60 + (slot * 30) % (12 * 60)
+                duration = rng.choice([30, 45, 60, 90])
+                end = start + duration
+                topic = rng.choice(TOPICS)
+                rows.append((
+                    f"sess_b{i:07d}", f"ttr_b{tutor:05d}", rng.choice(SUBJECTS), topic,
+                    rng.choice(LEVELS), f"Practice session on {topic.lower()} with worked examples",
+                    day, f"{start // 60:02d}:{start % 60:02d}", duration,
+                    f"{end // 60:02d}:{end % 60:02d}", rng.choice(MODES), 'Room 1', None
+                ))
+
+                if len(rows) == batch or i == sessions - 1:
+                    cursor.executemany('''
+                        INSERT IGNORE INTO sessions (
+                            session_id, tutor_id, subject, topic, level, details,
+                            date, start_time, duration, end_time, mode, status,
+                            location, online_link)
+                        VALUES (%s, %s, %s, %s, %s, %s, CURDATE() + INTERVAL %s DAY,
+                                %s, %s, %s, %s, 'active', %s, %s)
+                    ''', rows)
+                    connection.commit()
+                    rows = []
+
+            cursor.execute("ANALYZE TABLE sessions, tutors")
+            cursor.fetchall()
+        finally:
+            cursor.close()
@@ -0,0 +1,98 @@
+"""
+   Shared time-conflict detection on integer minute ranges.
+
+   Sessions are compared as absolute minute spans (see timemodel), so an
+   overlap test is two integer comparisons instead of strptime calls per
+   row, and sessions that run past midnight overlap the next day correctly.
+"""
+import bisect
+
+from timemodel import neighbour_dates, row_span, session_span
+
+
+def overlaps(start_a, end_a, start_b, end_b):
+    """True when the half-open minute ranges [start_a, end_a) and [start_b, end_b) intersect"""
+    return start_a < end_b and start_b < end_a
+
+
+class IntervalIndex:
+    """Sorted minute ranges with a running max end, for O(log n) overlap checks"""
+
+    def __init__(self, intervals=()):
+        # intervals: iterable of (start, end, payload)
+        self._items = sorted(intervals, key=lambda item: item[0])
+        self._starts = [item[0] for item in self._items]
+        self._max_end = []
+        running = None
+        for start, end, _ in self._items:
+            running = end if running is None else max(running, end)
+            self._max_end.append(running)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, payload=None):
+        """Inserts a range, keeping the index sorted"""
+        idx = bisect.bisect_right(self._starts, start)
+        self._items.insert(idx, (start, end, payload))
+        self._starts.insert(idx, start)
+
+        running = self._max_end[idx - 1] if idx else None
+        del self._max_end[idx:]
+        for _, item_end, _ in self._items[idx:]:
+            running = item_end if running is None else max(running, item_end)
+            self._max_end.append(running)
+
+    def overlapping(self, start, end):
+        """Returns the payloads of every stored range overlapping [start, end)"""
+        idx = bisect.bisect_left(self._starts, end)
+        found = []
+        while idx > 0 and self._max_end[idx - 1] > start:
+            idx -= 1
+            item_start, item_end, payload = self._items[idx]
+            if item_end > start:
+                found.append(payload)
+        found.reverse()
+        return found
+
+
+def tutor_conflicts_query(tutor_id, first_date, last_date, exclude_session_id=None):
+    """(query, params) reading the tutor's active sessions between two dates, in date order"""
+    query = '''
+        SELECT session_id, subject, date, start_time, end_time, duration
+        FROM sessions
+        WHERE tutor_id = %s AND date BETWEEN %s AND %s AND status = 'active'
+    '''
+    params = [tutor_id, first_date, last_date]
+    if exclude_session_id:
+        query += " AND session_id <> %s"
+        params.append(exclude_session_id)
+    query += " ORDER BY date, start_time"
+    return query, params
+
+
+def find_tutor_conflicts(connection, tutor_id, date, start_time, duration, exclude_session_id=None):
+    """Returns the tutor's active sessions that overlap a session of `duration` minutes at date/start_time.
+
+    One range scan on idx_sessions_tutor_date fetches the candidate days
+    (the day before, to catch sessions running past midnight, through the
+    day the new session ends); the overlap itself is tested on absolute
+    minute spans.
+    """
+    start, end = session_span(date, start_time, duration)
+    dates = neighbour_dates(date, start_time, duration)
+
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(*tutor_conflicts_query(tutor_id, dates[0], dates[-1], exclude_session_id))
+        return [row for row in cursor.fetchall() if overlaps(start, end, *row_span(row))]
+    finally:
+        cursor.close()
+
+
+def print_conflict(existing):
+    """Prints a conflicting session the way the tutor menus show it"""
+    print("\n⏰ Time conflict with existing session:")
+    print(f"Session ID: {existing['session_id']}")
+    print(f"Subject: {existing['subject']}")
+    print(f"Time: {existing['start_time']}-{existing['end_time']}")
@@ -0,0 +1,96 @@
+"""
+   Reconciliation for denormalized counters.
+
+   sessions.registration_count and session_requests.participant_count are
+   updated in the same transaction as the rows they count. This job
+   recomputes them in small batches, reports drift and (unless --check is
+   given) repairs it.
+
+   Usage: python counters.py [--check]
+"""
+import sys
+
+from mysql.connector import Error
+
+RECONCILE_BATCH_SIZE = 1000
+
+# name -> (table, key column, counter column, subquery computing the true value)
+COUNTERS = {
+    'registration_count': (
+        'sessions', 'session_id', 'registration_count',
+        "SELECT COUNT(*) FROM registrations r WHERE r.session_id = t.session_id AND r.status = 'registered'"
+    ),
+    'participant_count': (
+        'session_requests', 'request_id', 'participant_count',
+        "SELECT COUNT(*) FROM request_participations rp WHERE rp.request_id = t.request_id"
+    ),
+}
+
+
+def reconcile_counter(connection, name, repair=True, batch_size=RECONCILE_BATCH_SIZE):
+    """Returns [(key, stored, actual)] for rows whose counter drifted, fixing them when repair is True"""
+    table, key, counter, actual_query = COUNTERS[name]
+    drifted = []
+    after = ''
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute(f'''
+                SELECT t.{key}, t.{counter}, ({actual_query}) AS actual
+                FROM {table} t
+                WHERE t.{key} > %s
+                ORDER BY t.{key}
+                LIMIT %s
+            ''', (after, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            batch = [row for row in rows if row[1] != row[2]]
+            if batch and repair:
+                # Compare-and-set: a concurrent change makes the row skip this
+                # pass instead of being overwritten with a stale count
+                cursor.executemany(f'''
+                    UPDATE {table} SET {counter} = %s
+                    WHERE {key} = %s AND {counter} = %s
+                ''', [(actual, row_key, stored) for row_key, stored, actual in batch])
+            connection.commit()
+
+            drifted.extend(batch)
+            after = rows[-1][0]
+    finally:
+        cursor.close()
+
+    return drifted
+
+
+def reconcile_registration_counts(connection, repair=True, batch_size=RECONCILE_BATCH_SIZE):
+    """Reconciles sessions.registration_count against registrations"""
+    return reconcile_counter(connection, 'registration_count', repair, batch_size)
+
+
+def reconcile_participant_counts(connection, repair=True, batch_size=RECONCILE_BATCH_SIZE):
+    """Reconciles session_requests.participant_count against request_participations"""
+    return reconcile_counter(connection, 'participant_count', repair, batch_size)
+
+
+if __name__ == "__main__":
+    from main import TutoringSystem
+
+    repair = '--check' not in sys.argv[1:]
+    try:
+        system = TutoringSystem()
+        results = {}
+        with system.get_connection() as connection:
+            for name in COUNTERS:
+                results[name] = reconcile_counter(connection, name, repair=repair)
+    except Error as e:
+        print(f"Counter reconciliation failed: {e}")
+        sys.exit(2)
+
+    action = "repaired" if repair else "found"
+    for name, drifted in results.items():
+        for row_key, stored, actual in drifted:
+            print(f"- {name} {row_key}: stored {stored}, actual {actual}")
+        print(f"{name}: {len(drifted)} drifted row(s) {action}.")
+    sys.exit(1 if not repair and any(results.values()) else 0)
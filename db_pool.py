@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections with health checks and usage counters"""
+
+    def __init__(self, config, size=5, timeout=10, max_idle=300, max_lifetime=3600,
+                 health_check_interval=30):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # entries are [connection, created_at, last_used]
+        self._in_use = {}
+        self._created = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._evictions = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+        self._busy_time = 0.0
+        self._started_at = time.monotonic()
+
+    def _open(self):
+        """Opens a brand new connection using the pool configuration"""
+        now = time.monotonic()
+        return [mysql.connector.connect(**self.config), now, now]
+
+    def _is_healthy(self, entry):
+        """Checks a pooled connection before handing it out, evicting stale ones"""
+        connection, created_at, last_used = entry
+        now = time.monotonic()
+
+        if now - created_at > self.max_lifetime or now - last_used > self.max_idle:
+            return False
+
+        if now - last_used > self.health_check_interval:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                return False
+
+        return True
+
+    def _discard(self, entry):
+        """Closes a connection that is leaving the pool for good"""
+        try:
+            entry[0].close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Checks out a connection, waiting up to the pool timeout for one to free up"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            entry = None
+            must_open = False
+
+            with self._lock:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+
+                while not self._idle and self._created >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolError(
+                            f"No database connection available after {self.timeout}s "
+                            f"(pool size {self.size})"
+                        )
+                    self._lock.wait(remaining)
+
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._created += 1
+                    must_open = True
+
+            if must_open:
+                try:
+                    entry = self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                        self._lock.notify()
+                    raise
+            elif not self._is_healthy(entry):
+                self._discard(entry)
+                with self._lock:
+                    self._created -= 1
+                    self._evictions += 1
+                    self._lock.notify()
+                continue
+
+            waited = time.monotonic() - started
+            with self._lock:
+                self._in_use[id(entry[0])] = (entry, time.monotonic())
+                self._checkouts += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+                self._peak_in_use = max(self._peak_in_use, len(self._in_use))
+            return entry[0]
+
+    def release(self, connection):
+        """Returns a connection to the pool, rolling back anything left uncommitted"""
+        with self._lock:
+            entry, checked_out_at = self._in_use.pop(id(connection))
+            self._busy_time += time.monotonic() - checked_out_at
+
+        healthy = True
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            if healthy and not self._closed:
+                entry[2] = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._created -= 1
+                self._evictions += 1
+                self._discard(entry)
+            # Sweep the rest of the idle list too, so connections nobody checks
+            # out are closed once they pass max_idle instead of lingering
+            self._evict_stale()
+            self._lock.notify_all()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always returns it"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def _evict_stale(self):
+        """Closes idle connections past their idle or lifetime limits; the caller holds the lock"""
+        now = time.monotonic()
+        keep = deque()
+        for entry in self._idle:
+            if now - entry[1] > self.max_lifetime or now - entry[2] > self.max_idle:
+                self._discard(entry)
+                self._created -= 1
+                self._evictions += 1
+            else:
+                keep.append(entry)
+        self._idle = keep
+
+    def stats(self):
+        """Returns wait-time and utilization counters for sizing the pool"""
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started_at, 1e-9)
+            in_use = len(self._in_use)
+            return {
+                'size': self.size,
+                'open': self._created,
+                'in_use': in_use,
+                'idle': len(self._idle),
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'evictions': self._evictions,
+                'avg_wait_ms': (self._total_wait / self._checkouts * 1000) if self._checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+                'utilization': in_use / self.size,
+                'avg_utilization': self._busy_time / (elapsed * self.size),
+            }
+
+    def close_all(self):
+        """Closes every idle connection and stops handing out new ones"""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._created -= 1
+            self._lock.notify_all()
@@ -0,0 +1,79 @@
+import threading
+
+
+class IdAllocator:
+    """Hands out entity IDs from blocks reserved in the id_sequences table.
+
+    Each process reserves `block_size` numbers per entity with one atomic
+    UPDATE and then serves IDs from memory. Numbers left in a block when the
+    process exits are simply skipped, so IDs stay unique but may have gaps.
+    """
+
+    PREFIXES = {
+        'student': ('st_', 'students', 'student_id'),
+        'tutor': ('ttr_', 'tutors', 'tutor_id'),
+        'session': ('sess_', 'sessions', 'session_id'),
+        'request': ('req_', 'session_requests', 'request_id'),
+        'series': ('ser_', 'session_series', 'series_id')
+    }
+
+    def __init__(self, pool, block_size=20):
+        self.pool = pool
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}  # entity_type -> [next_number, end_of_block]
+
+    def next_id(self, entity_type):
+        """Returns the next ID for the entity, reserving a new block when needed"""
+        prefix = self.PREFIXES[entity_type][0]
+
+        with self._lock:
+            block = self._blocks.get(entity_type)
+            if block is None or block[0] >= block[1]:
+                block = self._reserve_block(entity_type)
+                self._blocks[entity_type] = block
+
+            number = block[0]
+            block[0] += 1
+
+        return f"{prefix}{number:03d}"
+
+    def _reserve_block(self, entity_type):
+        """Atomically moves the stored sequence forward by one block and returns the range"""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('''
+                    UPDATE id_sequences
+                    SET next_value = LAST_INSERT_ID(next_value + %s)
+                    WHERE name = %s
+                ''', (self.block_size, entity_type))
+
+                if cursor.rowcount == 0:
+                    # First use of this sequence: start it after the highest existing ID
+                    self._seed(cursor, entity_type)
+                    cursor.execute('''
+                        UPDATE id_sequences
+                        SET next_value = LAST_INSERT_ID(next_value + %s)
+                        WHERE name = %s
+                    ''', (self.block_size, entity_type))
+
+                cursor.execute("SELECT LAST_INSERT_ID()")
+                end = cursor.fetchone()[0]
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        return [end - self.block_size, end]
+
+    def _seed(self, cursor, entity_type):
+        """Creates the sequence row from the current maximum ID (runs once per entity)"""
+        prefix, table, column = self.PREFIXES[entity_type]
+        cursor.execute(f'''
+            INSERT IGNORE INTO id_sequences (name, next_value)
+            SELECT %s, COALESCE(MAX(CAST(SUBSTRING({column}, {len(prefix) + 1}) AS UNSIGNED)), 0) + 1
+            FROM {table}
+        ''', (entity_type,))
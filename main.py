@@ -1,9 +1,18 @@
 import mysql.connector
-import datetime
 import hashlib
-from mysql.connector import Error
+from contextlib import contextmanager
+from mysql.connector import Error, errorcode
 from datetime import timedelta
-import re
+
+import migrations
+import schedule
+import services
+import timemodel
+from audit import AuditWriter
+from cache import LRUCache
+from db_pool import ConnectionPool
+from id_allocator import IdAllocator
+from transactions import TransactionRunner, prune_idempotency_keys
 
 
 class TutoringSystem:
@@ -11,9 +20,14 @@ class TutoringSystem:
         self.current_user_id = None
         self.current_user_role = None
         self.current_user_name = None
-        self.connection = None
+        self.pool = None
+        self.id_allocator = None
+        self.transactions = None
+        self.audit_writer = None
+        self.session_cache = LRUCache(**self.get_cache_config())
         self.connect_to_database()
         self.init_db()
+        self.start_audit_writer()
 
     def get_db_config(self):
         """Returns database configuration"""
@@ -26,43 +40,59 @@ class TutoringSystem:
             'ssl_disabled': False
         }
 
-    def connect_to_database(self):
-        """Establishes database connection and creates database if needed"""
-        config = self.get_db_config()
+    def get_pool_config(self):
+        """Returns connection pool sizing and health-check settings"""
+        return {
+            'size': 5,                     # maximum open connections
+            'timeout': 10,                 # seconds to wait for a free connection
+            'max_idle': 300,               # idle seconds before a connection is closed (checked on checkout and return)
+            'max_lifetime': 3600,          # seconds before any connection is recycled
+            'health_check_interval': 30    # ping connections idle longer than this
+        }
 
-        try:
-            # First connect without specifying a database
-            temp_connection = mysql.connector.connect(
-                host=config['host'],
-                port=config['port'],
-                user=config['user'],
-                password=config['password'],
-                ssl_disabled=config['ssl_disabled']
-            )
+    def get_cache_config(self):
+        """Returns size and time-to-live for the session details cache"""
+        return {
+            'max_size': 256,               # sessions kept in memory
+            'ttl': 60                      # seconds before a cached session is re-read
+        }
 
-            cursor = temp_connection.cursor()
+    def get_retry_config(self):
+        """Returns how often and how patiently deadlocked or lock-timed-out transactions are retried"""
+        return {
+            'max_attempts': 4,             # total tries before the error reaches the user
+            'base_delay': 0.05,            # seconds; doubled after every failed attempt
+            'max_delay': 1.0               # upper bound for a single backoff
+        }
 
-            # Check if database exists
-            cursor.execute(f"SHOW DATABASES LIKE '{config['database']}'")
-            result = cursor.fetchone()
+    def get_audit_config(self):
+        """Returns how session edit audit rows are written"""
+        return {
+            'background': False,           # True: queue audit rows for a background writer
+            'batch_size': 200,             # rows per multi-row INSERT from the writer
+            'flush_interval': 0.5          # seconds the writer waits for more rows
+        }
 
-            if not result:
-                # Create the database if it doesn't exist
-                cursor.execute(f"CREATE DATABASE {config['database']}")
-                print(f"Created database {config['database']}")
+    def connect_to_database(self):
+        """Establishes database connection and creates database if needed"""
+        config = self.get_db_config()
 
-            cursor.close()
-            temp_connection.close()
+        try:
+            # Build the pool of connections to the specific database
+            self.pool = ConnectionPool(config, **self.get_pool_config())
+            self.id_allocator = IdAllocator(self.pool)
+            self.transactions = TransactionRunner(self.get_connection, **self.get_retry_config())
 
-            # Now connect to the specific database
-            self.connection = mysql.connector.connect(
-                host=config['host'],
-                port=config['port'],
-                user=config['user'],
-                password=config['password'],
-                database=config['database'],
-                ssl_disabled=config['ssl_disabled']
-            )
+            # Open the first connection up front so bad credentials fail fast
+            try:
+                with self.get_connection():
+                    pass
+            except Error as e:
+                if e.errno != errorcode.ER_BAD_DB_ERROR:
+                    raise
+                self.create_database(config)
+                with self.get_connection():
+                    pass
 
             print("Successfully connected to database")
 
@@ -70,137 +100,95 @@ class TutoringSystem:
             print(f"Database connection failed: {e}")
             raise
 
+    def create_database(self, config):
+        """Creates the application database (only reached when it does not exist yet)"""
+        # Connect without specifying a database
+        temp_connection = mysql.connector.connect(
+            host=config['host'],
+            port=config['port'],
+            user=config['user'],
+            password=config['password'],
+            ssl_disabled=config['ssl_disabled']
+        )
+
+        cursor = temp_connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {config['database']}")
+        print(f"Created database {config['database']}")
+
+        cursor.close()
+        temp_connection.close()
+
+    @contextmanager
+    def get_connection(self):
+        """Checks a connection out of the pool for one operation and returns it afterwards"""
+        with self.pool.connection() as connection:
+            yield connection
+
+    def pool_stats(self):
+        """Returns pool wait-time and utilization counters"""
+        return self.pool.stats()
+
+    def run_transaction(self, work, dictionary=False, idempotent=False, idempotency_key=None):
+        """Runs work(cursor) in one transaction, retrying deadlocks and lock-wait timeouts"""
+        return self.transactions.run(
+            work, dictionary=dictionary, idempotent=idempotent, idempotency_key=idempotency_key
+        )
+
+    def transaction_stats(self):
+        """Returns commit, retry and abort counters of the write paths"""
+        return self.transactions.stats()
+
     def init_db(self):
-        """Initializes database tables"""
+        """Brings the database schema up to date through versioned migrations"""
         try:
-            cursor = self.connection.cursor()
-
-            # Create tables if they don't exist
-            tables = [
-                '''CREATE TABLE IF NOT EXISTS students (
-                    student_id VARCHAR(15) PRIMARY KEY,
-                    name VARCHAR(25) NOT NULL,
-                    email VARCHAR(25) NOT NULL UNIQUE,
-                    password_hash VARCHAR(64) NOT NULL
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS tutors (
-                    tutor_id VARCHAR(15) PRIMARY KEY,
-                    name VARCHAR(25) NOT NULL,
-                    email VARCHAR(25) NOT NULL UNIQUE,
-                    password_hash VARCHAR(64) NOT NULL
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS session_requests (
-                    request_id VARCHAR(10) PRIMARY KEY,
-                    student_id VARCHAR(10) NOT NULL,
-                    subject VARCHAR(50) NOT NULL,
-                    topic VARCHAR(50) NOT NULL,
-                    level VARCHAR(20) NOT NULL,
-                    details TEXT,
-                    request_date DATE NOT NULL,
-                    status VARCHAR(20) DEFAULT 'pending',
-                    FOREIGN KEY (student_id) REFERENCES students(student_id)
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS request_participations (
-                    request_id VARCHAR(10),
-                    student_id VARCHAR(10),
-                    PRIMARY KEY (request_id, student_id),
-                    FOREIGN KEY (request_id) REFERENCES session_requests(request_id),
-                    FOREIGN KEY (student_id) REFERENCES students(student_id)
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS sessions (
-                    session_id VARCHAR(10) PRIMARY KEY,
-                    tutor_id VARCHAR(10) NOT NULL,
-                    subject VARCHAR(50) NOT NULL,
-                    topic VARCHAR(50) NOT NULL,
-                    level VARCHAR(20) NOT NULL,
-                    details TEXT,
-                    date DATE NOT NULL,
-                    start_time TIME NOT NULL,
-                    duration INT NOT NULL,
-                    end_time TIME NOT NULL,
-                    mode VARCHAR(20) NOT NULL,
-                    status VARCHAR(20) DEFAULT 'active',
-                    from_request BOOLEAN DEFAULT FALSE,
-                    request_id VARCHAR(10),
-                    location VARCHAR(100),
-                    online_link VARCHAR(255),
-                    FOREIGN KEY (tutor_id) REFERENCES tutors(tutor_id),
-                    FOREIGN KEY (request_id) REFERENCES session_requests(request_id),
-                    UNIQUE KEY unique_session_time (date, start_time, tutor_id)
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS registrations (
-                    registration_id INT AUTO_INCREMENT PRIMARY KEY,
-                    student_id VARCHAR(10) NOT NULL,
-                    session_id VARCHAR(10) NOT NULL,
-                    registration_date DATE NOT NULL,
-                    status VARCHAR(20) DEFAULT 'registered',
-                    FOREIGN KEY (student_id) REFERENCES students(student_id),
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS session_updates (
-                    update_id INT AUTO_INCREMENT PRIMARY KEY,
-                    session_id VARCHAR(10) NOT NULL,
-                    field_name VARCHAR(20) NOT NULL,
-                    old_value TEXT,
-                    new_value TEXT,
-                    update_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
-                )''',
-
-                '''CREATE TABLE IF NOT EXISTS cancellations (
-                    cancellation_id INT AUTO_INCREMENT PRIMARY KEY,
-                    session_id VARCHAR(10),
-                    student_id VARCHAR(10),
-                    cancellation_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    reason TEXT,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id),
-                    FOREIGN KEY (student_id) REFERENCES students(student_id)
-                )'''
-            ]
-
-            for table in tables:
-                cursor.execute(table)
-
-            self.connection.commit()
-            cursor.close()
+            with self.get_connection() as connection:
+                applied = migrations.migrate(connection)
+
+            for version, description in applied:
+                print(f"Applied schema migration {version}: {description}")
 
         except Error as e:
             print(f"Database initialization failed: {e}")
             raise
 
+    def prune_expired_schedule(self):
+        """Drops schedule rows for dates that have passed (cheap when there is nothing to prune)"""
+        try:
+            with self.get_connection() as connection:
+                schedule.prune_expired(connection)
+        except Error as e:
+            # Stale rows are filtered out by date anyway, so this never blocks archiving
+            print(f"Schedule pruning skipped: {e}")
+
+    def prune_idempotency_keys(self):
+        """Drops idempotency keys that are too old to be replayed"""
+        try:
+            with self.get_connection() as connection:
+                prune_idempotency_keys(connection)
+        except Error as e:
+            print(f"Idempotency key pruning skipped: {e}")
+
+    def start_audit_writer(self):
+        """Starts the background audit writer when it is enabled in the audit config"""
+        config = self.get_audit_config()
+        if config['background']:
+            self.audit_writer = AuditWriter(
+                self.transactions, batch_size=config['batch_size'], flush_interval=config['flush_interval']
+            )
+
     def hash_password(self, password):
         """Returns SHA-256 hash of the password"""
         return hashlib.sha256(password.encode()).hexdigest()
 
     def get_valid_input(self):
-        """Prompt for a password with rule-specific feedback and return the hashed password."""
-        import re
-
-        def check_password_rules(password: str) -> list:
-            errors = []
-            if len(password) < 5:
-                errors.append("- Must be at least 5 characters")
-            if not re.search(r"[A-Z]", password):
-                errors.append("- Must include at least one uppercase letter")
-            if not re.search(r"[a-z]", password):
-                errors.append("- Must include at least one lowercase letter")
-            if not re.search(r"\d", password):
-                errors.append("- Must include at least one number")
-            return errors
-
+        """Prompt for a password with rule-specific feedback and return it once it passes the rules."""
         print("\nPassword Requirements:\n- At least 5 characters\n- At least one uppercase letter\n- At least one lowercase letter\n- At least one number\n")
 
         while True:
             password = input("Enter your password: ").strip()
-            errors = check_password_rules(password)
+            errors = services.password_problems(password)
             if not errors:
-                return self.hash_password(password)
+                return password
 
             print("\n❌ Password does not meet the following criteria:")
             for error in errors:
@@ -215,57 +203,24 @@ class TutoringSystem:
             print(error_msg)
 
     def generate_id(self, entity_type):
-        """Generates consistent IDs for entities"""
-        prefix_map = {
-            'student': ('st_', 'students', 'student_id'),
-            'tutor': ('ttr_', 'tutors', 'tutor_id'),
-            'session': ('sess_', 'sessions', 'session_id'),
-            'request': ('req_', 'session_requests', 'request_id')
-        }
-
+        """Generates consistent IDs for entities from the block-allocating ID service"""
         try:
-            prefix, table, column = prefix_map[entity_type]
-            cursor = self.connection.cursor()
-
-            query = f"SELECT MAX(CAST(SUBSTRING({column}, {len(prefix) + 1}) AS UNSIGNED)) FROM {table}"
-            cursor.execute(query)
-            max_id = cursor.fetchone()[0]
-            new_id_num = (max_id or 0) + 1
-            new_id = f"{prefix}{new_id_num:03d}"
-
-            max_length = {'st_': 6, 'ttr_': 7, 'sess_': 8, 'req_': 7}[prefix]
-            if len(new_id) > max_length:
-                raise ValueError(f"Generated ID exceeds maximum length")
-
-            return new_id
-
+            return self.id_allocator.next_id(entity_type)
         except Error as e:
             print(f"Error generating ID: {e}")
             raise
-        finally:
-            if cursor:
-                cursor.close()
 
     def get_session_details(self, session_id):
-        """Retrieves session details by ID"""
+        """Retrieves session details by ID, served from the session cache when possible"""
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute('''
-                SELECT s.*, t.name AS tutor_name, 
-                       COUNT(r.student_id) AS registration_count
-                FROM sessions s
-                JOIN tutors t ON s.tutor_id = t.tutor_id
-                LEFT JOIN registrations r ON s.session_id = r.session_id AND r.status = 'registered'
-                WHERE s.session_id = %s
-                GROUP BY s.session_id
-            ''', (session_id,))
-            return cursor.fetchone()
+            return services.get_session(self, session_id)
         except Error as e:
             print(f"Error retrieving session: {e}")
             return None
-        finally:
-            if cursor:
-                cursor.close()
+
+    def invalidate_sessions(self, *session_ids):
+        """Drops cached details for sessions changed by a write path"""
+        self.session_cache.invalidate(*session_ids)
 
     def register_user(self, role):
         """Registers a new user"""
@@ -276,20 +231,10 @@ class TutoringSystem:
             lambda x: '@' in x and '.' in x,
             "Please enter a valid email address."
         )
-        password_hash = self.get_valid_input()  # calls the password input + validation + hashing
+        password = self.get_valid_input()
 
         try:
-            cursor = self.connection.cursor(dictionary=True)
-
-            # Check for existing accounts
-            cursor.execute('''
-                SELECT student_id AS id, 'student' AS role FROM students WHERE email = %s
-                UNION
-                SELECT tutor_id AS id, 'tutor' AS role FROM tutors WHERE email = %s
-            ''', (email, email))
-
-            existing = cursor.fetchall()
-
+            existing = services.find_accounts(self, email)
             if existing:
                 print("\nAccount with this email exists:")
                 for acc in existing:
@@ -303,24 +248,17 @@ class TutoringSystem:
                     return None
 
             # Create new account
-            user_id = self.generate_id(role)
-            table = 'students' if role == 'student' else 'tutors'
-            cursor.execute(
-                f"INSERT INTO {table} ({role}_id, name, email, password_hash) VALUES (%s, %s, %s, %s)",
-                (user_id, name, email, password_hash)
-            )
+            user_id = services.register_account(self, role, name, email, password, existing)
 
-            self.connection.commit()
             print(f"\nRegistration successful! Your {role} ID is: {user_id}")
             return user_id
 
+        except services.ServiceError as e:
+            print(f"\n{e}")
+            return None
         except Error as e:
             print(f"Registration error: {e}")
-            self.connection.rollback()
             return None
-        finally:
-            if cursor:
-                cursor.close()
 
     def login_user(self):
         """Authenticates a user"""
@@ -329,67 +267,23 @@ class TutoringSystem:
         password = input("Enter your password: ")
 
         try:
-            cursor = self.connection.cursor(dictionary=True)
-
-            if user_id.startswith('st_'):
-                cursor.execute(
-                    "SELECT student_id, name, password_hash FROM students WHERE student_id = %s",
-                    (user_id,)
-                )
-                role = 'student'
-            elif user_id.startswith('ttr_'):
-                cursor.execute(
-                    "SELECT tutor_id, name, password_hash FROM tutors WHERE tutor_id = %s",
-                    (user_id,)
-                )
-                role = 'tutor'
-            else:
-                print("Invalid ID format")
-                return False
-
-            user = cursor.fetchone()
-            if user:
-                # Verify password
-                if user['password_hash'] == self.hash_password(password):
-                    self.current_user_id = user[f"{role}_id"]
-                    self.current_user_role = role
-                    self.current_user_name = user['name']
-                    print(f"\nWelcome back, {role} {user['name']}!")
-                    return True
-                else:
-                    print("Incorrect password")
-                    return False
-
-            print("ID not found. Please try again or register.")
+            user = services.login(self, user_id, password)
+        except services.ServiceError as e:
+            print(e)
             return False
-
         except Error as e:
             print(f"Login error: {e}")
             return False
-        finally:
-            if cursor:
-                cursor.close()    
+
+        self.current_user_id = user['user_id']
+        self.current_user_role = user['role']
+        self.current_user_name = user['name']
+        print(f"\nWelcome back, {user['role']} {user['name']}!")
+        return True
 
     def calculate_end_time(self, start_time, duration_minutes):
-        """Calculates end time based on start time and duration Handle all possible input types"""
-        if isinstance(start_time, str):
-            # Handle string input (HH:MM)
-            try:
-                start_dt = datetime.datetime.strptime(start_time, "%H:%M")
-            except ValueError:
-                # Try with seconds if needed
-                start_dt = datetime.datetime.strptime(start_time, "%H:%M:%S")
-        elif isinstance(start_time, datetime.time):
-            # Handle time object directly
-            start_dt = datetime.datetime.combine(datetime.date.today(), start_time)
-        elif isinstance(start_time, datetime.timedelta):
-            # Handle timedelta (shouldn't normally happen, but just in case)
-            start_dt = datetime.datetime.min + start_time
-        else:
-            raise ValueError(f"start_time must be string (HH:MM) or datetime.time, got {type(start_time)}")
-
-        end_dt = start_dt + datetime.timedelta(minutes=duration_minutes)
-        return end_dt.time().strftime("%H:%M")
+        """Calculates the wall-clock end time ('HH:MM') of a session, wrapping past midnight"""
+        return timemodel.end_time(start_time, duration_minutes)
 
     def run(self):
         """Main system loop"""
@@ -439,8 +333,10 @@ class TutoringSystem:
                     print("Invalid choice. Please try again.")
             elif choice == '3':
                 print("\nThank you for using the Tutoring Management System. Goodbye!")
-                if self.connection and self.connection.is_connected():
-                    self.connection.close()
+                if self.audit_writer:
+                    self.audit_writer.close()
+                if self.pool:
+                    self.pool.close_all()
                 break
             else:
                 print("Invalid choice. Please try again.")
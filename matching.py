@@ -0,0 +1,204 @@
+"""
+   Tutor-request matching.
+
+   Tutors record the (subject, level) pairs they teach in tutor_subjects.
+   ExpertiseIndex inverts those rows into (subject, level) -> tutors so every
+   pending request finds its qualified tutors with one dict lookup per level.
+   Each (tutor, request) pair is scored by
+
+       demand (log of participants) x level fit x load share
+
+   where load share is the tutor's weight 1 / (1 + upcoming sessions) divided
+   by the total weight of all qualified tutors, so requests drift toward the
+   tutors with the most room. Shortlists for every tutor come out of a single
+   pass over the pending requests.
+"""
+import heapq
+import math
+
+from records import Request, fetch_records
+
+LEVELS = ['Beginner', 'Intermediate', 'Advanced']
+
+# Level fit by distance between the requested level and a level the tutor teaches
+LEVEL_FIT = {0: 1.0, 1: 0.5}
+
+SHORTLIST_SIZE = 10
+
+
+def subject_key(subject):
+    """Case- and whitespace-insensitive subject used by the index"""
+    return ' '.join(subject.split()).lower()
+
+
+def level_distance(a, b):
+    """Steps between two levels (unknown levels only match themselves)"""
+    if a == b:
+        return 0
+    if a in LEVELS and b in LEVELS:
+        return abs(LEVELS.index(a) - LEVELS.index(b))
+    return None
+
+
+class ExpertiseIndex:
+    """Inverted index (subject, level) -> tutor IDs, plus the reverse per tutor"""
+
+    def __init__(self, rows=()):
+        self._tutors = {}    # (subject key, level) -> set of tutor IDs
+        self._teaches = {}   # tutor ID -> set of (subject key, level)
+        for tutor_id, subject, level in rows:
+            self.add(tutor_id, subject, level)
+
+    def add(self, tutor_id, subject, level):
+        key = (subject_key(subject), level)
+        self._tutors.setdefault(key, set()).add(tutor_id)
+        self._teaches.setdefault(tutor_id, set()).add(key)
+
+    def tutors_for(self, subject, level):
+        """Returns {tutor_id: level fit} for every tutor qualified for a request"""
+        subject = subject_key(subject)
+        fits = {}
+        for taught_level in LEVELS if level in LEVELS else [level]:
+            fit = LEVEL_FIT.get(level_distance(level, taught_level))
+            if fit is None:
+                continue
+            for tutor_id in self._tutors.get((subject, taught_level), ()):
+                fits[tutor_id] = max(fits.get(tutor_id, 0.0), fit)
+        return fits
+
+    def tutor_ids(self):
+        return set(self._teaches)
+
+
+def fetch_tutor_expertise(connection, tutor_id):
+    """Returns [(subject, level)] recorded for one tutor"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute('''
+            SELECT subject, level FROM tutor_subjects
+            WHERE tutor_id = %s ORDER BY subject, level
+        ''', (tutor_id,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def expertise_query(subjects=None):
+    """(query, params) reading tutor_subjects, optionally only for the given (non-empty) subjects"""
+    query = "SELECT tutor_id, subject, level FROM tutor_subjects"
+    params = []
+    if subjects is not None:
+        query += f" WHERE subject IN ({', '.join(['%s'] * len(subjects))})"
+        params = list(subjects)
+    return query, params
+
+
+def fetch_expertise_index(connection, subjects=None):
+    """Builds the index from tutor_subjects, optionally only for the given subjects"""
+    if subjects is not None and not subjects:
+        return ExpertiseIndex()
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(*expertise_query(subjects))
+        return ExpertiseIndex(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def tutor_loads_query(tutor_ids=None):
+    """(query, params) counting upcoming active sessions per tutor, optionally only the given (non-empty) tutors"""
+    query = '''
+        SELECT tutor_id, COUNT(*) FROM sessions
+        WHERE status = 'active' AND date >= CURDATE()
+    '''
+    params = []
+    if tutor_ids is not None:
+        query += f" AND tutor_id IN ({', '.join(['%s'] * len(tutor_ids))})"
+        params = list(tutor_ids)
+    query += " GROUP BY tutor_id"
+    return query, params
+
+
+def fetch_tutor_loads(connection, tutor_ids=None):
+    """Returns {tutor_id: upcoming active sessions}"""
+    if tutor_ids is not None and not tutor_ids:
+        return {}
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(*tutor_loads_query(tutor_ids))
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def pending_for_subjects_query(subjects=None):
+    """(query, params) reading pending requests, optionally only in the given (non-empty) subjects"""
+    query = f'''
+        SELECT {Request.columns()}
+        FROM session_requests sr
+        WHERE sr.status = 'pending'
+    '''
+    params = []
+    if subjects is not None:
+        query += f" AND sr.subject IN ({', '.join(['%s'] * len(subjects))})"
+        params = list(subjects)
+    return query, params
+
+
+def fetch_pending_for_subjects(connection, subjects=None):
+    """Returns pending requests, optionally only in the given subjects"""
+    if subjects is not None and not subjects:
+        return []
+    return fetch_records(connection, Request, *pending_for_subjects_query(subjects))
+
+
+def rank_requests(requests, index, loads, tutor_ids=None, limit=SHORTLIST_SIZE):
+    """Scores every (tutor, request) pair in one pass; returns {tutor_id: [request, ...]} best first.
+
+    Each returned request is a copy carrying 'match_score' and 'level_fit'.
+    """
+    wanted = set(tutor_ids) if tutor_ids is not None else None
+    scored = {}
+    for request in requests:
+        fits = index.tutors_for(request['subject'], request['level'])
+        if not fits:
+            continue
+
+        weights = {tutor_id: 1.0 / (1 + loads.get(tutor_id, 0)) for tutor_id in fits}
+        total_weight = sum(weights.values())
+        demand = math.log1p(request['participant_count'])
+
+        for tutor_id, fit in fits.items():
+            if wanted is not None and tutor_id not in wanted:
+                continue
+            score = demand * fit * weights[tutor_id] / total_weight
+            scored.setdefault(tutor_id, []).append((score, fit, request))
+
+    shortlists = {}
+    for tutor_id, candidates in scored.items():
+        best = heapq.nlargest(
+            limit or len(candidates), candidates,
+            key=lambda item: (item[0], item[2]['participant_count'])
+        )
+        shortlists[tutor_id] = [
+            dict(request, match_score=round(score, 4), level_fit=fit)
+            for score, fit, request in best
+        ]
+    return shortlists
+
+
+def shortlist_for_tutor(connection, tutor_id, limit=SHORTLIST_SIZE):
+    """Returns the tutor's ranked requests, or None when the tutor has recorded no subjects"""
+    expertise = fetch_tutor_expertise(connection, tutor_id)
+    if not expertise:
+        return None
+
+    # Only the subjects this tutor teaches (and the tutors competing for them) matter
+    subjects = sorted({subject for subject, _ in expertise})
+    index = fetch_expertise_index(connection, subjects)
+    loads = fetch_tutor_loads(connection, sorted(index.tutor_ids()))
+    requests = fetch_pending_for_subjects(connection, subjects)
+    return rank_requests(requests, index, loads, [tutor_id], limit).get(tutor_id, [])
+
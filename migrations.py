@@ -0,0 +1,447 @@
+"""
+   Versioned schema migrations.
+
+   Each migration is (version, description, statements) and is applied once,
+   in order. The applied version is stored in schema_version so a normal
+   startup costs a single SELECT. DDL commits as it goes, so a migration that
+   failed halfway is re-run from its first statement: statements whose change
+   is already in place are skipped, and data backfills only add missing rows.
+"""
+from mysql.connector import Error, errorcode
+
+MIGRATION_LOCK = 'tms_schema_migration'
+
+# Errors meaning a statement's change was made by an earlier, interrupted run
+ALREADY_APPLIED = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME,
+    errorcode.ER_CANT_DROP_FIELD_OR_KEY,
+}
+
+MIGRATIONS = [
+    (1, 'Baseline tables', [
+        '''CREATE TABLE IF NOT EXISTS students (
+            student_id VARCHAR(15) PRIMARY KEY,
+            name VARCHAR(25) NOT NULL,
+            email VARCHAR(25) NOT NULL UNIQUE,
+            password_hash VARCHAR(64) NOT NULL
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS tutors (
+            tutor_id VARCHAR(15) PRIMARY KEY,
+            name VARCHAR(25) NOT NULL,
+            email VARCHAR(25) NOT NULL UNIQUE,
+            password_hash VARCHAR(64) NOT NULL
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS session_requests (
+            request_id VARCHAR(10) PRIMARY KEY,
+            student_id VARCHAR(10) NOT NULL,
+            subject VARCHAR(50) NOT NULL,
+            topic VARCHAR(50) NOT NULL,
+            level VARCHAR(20) NOT NULL,
+            details TEXT,
+            request_date DATE NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            FOREIGN KEY (student_id) REFERENCES students(student_id)
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS request_participations (
+            request_id VARCHAR(10),
+            student_id VARCHAR(10),
+            PRIMARY KEY (request_id, student_id),
+            FOREIGN KEY (request_id) REFERENCES session_requests(request_id),
+            FOREIGN KEY (student_id) REFERENCES students(student_id)
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS sessions (
+            session_id VARCHAR(10) PRIMARY KEY,
+            tutor_id VARCHAR(10) NOT NULL,
+            subject VARCHAR(50) NOT NULL,
+            topic VARCHAR(50) NOT NULL,
+            level VARCHAR(20) NOT NULL,
+            details TEXT,
+            date DATE NOT NULL,
+            start_time TIME NOT NULL,
+            duration INT NOT NULL,
+            end_time TIME NOT NULL,
+            mode VARCHAR(20) NOT NULL,
+            status VARCHAR(20) DEFAULT 'active',
+            from_request BOOLEAN DEFAULT FALSE,
+            request_id VARCHAR(10),
+            location VARCHAR(100),
+            online_link VARCHAR(255),
+            FOREIGN KEY (tutor_id) REFERENCES tutors(tutor_id),
+            FOREIGN KEY (request_id) REFERENCES session_requests(request_id),
+            UNIQUE KEY unique_session_time (date, start_time, tutor_id)
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS registrations (
+            registration_id INT AUTO_INCREMENT PRIMARY KEY,
+            student_id VARCHAR(10) NOT NULL,
+            session_id VARCHAR(10) NOT NULL,
+            registration_date DATE NOT NULL,
+            status VARCHAR(20) DEFAULT 'registered',
+            FOREIGN KEY (student_id) REFERENCES students(student_id),
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS session_updates (
+            update_id INT AUTO_INCREMENT PRIMARY KEY,
+            session_id VARCHAR(10) NOT NULL,
+            field_name VARCHAR(20) NOT NULL,
+            old_value TEXT,
+            new_value TEXT,
+            update_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )''',
+
+        '''CREATE TABLE IF NOT EXISTS cancellations (
+            cancellation_id INT AUTO_INCREMENT PRIMARY KEY,
+            session_id VARCHAR(10),
+            student_id VARCHAR(10),
+            cancellation_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            reason TEXT,
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id),
+            FOREIGN KEY (student_id) REFERENCES students(student_id)
+        )'''
+    ]),
+
+    (2, 'ID sequences for block allocation', [
+        '''CREATE TABLE IF NOT EXISTS id_sequences (
+            name VARCHAR(20) PRIMARY KEY,
+            next_value BIGINT UNSIGNED NOT NULL
+        )'''
+    ]),
+
+    (3, 'Widen ID columns past three digits', [
+        "SET FOREIGN_KEY_CHECKS = 0",
+        "ALTER TABLE students MODIFY student_id VARCHAR(20) NOT NULL",
+        "ALTER TABLE tutors MODIFY tutor_id VARCHAR(20) NOT NULL",
+        '''ALTER TABLE session_requests
+            MODIFY request_id VARCHAR(20) NOT NULL,
+            MODIFY student_id VARCHAR(20) NOT NULL''',
+        '''ALTER TABLE request_participations
+            MODIFY request_id VARCHAR(20) NOT NULL,
+            MODIFY student_id VARCHAR(20) NOT NULL''',
+        '''ALTER TABLE sessions
+            MODIFY session_id VARCHAR(20) NOT NULL,
+            MODIFY tutor_id VARCHAR(20) NOT NULL,
+            MODIFY request_id VARCHAR(20)''',
+        '''ALTER TABLE registrations
+            MODIFY student_id VARCHAR(20) NOT NULL,
+            MODIFY session_id VARCHAR(20) NOT NULL''',
+        "ALTER TABLE session_updates MODIFY session_id VARCHAR(20) NOT NULL",
+        '''ALTER TABLE cancellations
+            MODIFY session_id VARCHAR(20),
+            MODIFY student_id VARCHAR(20)''',
+        "SET FOREIGN_KEY_CHECKS = 1"
+    ]),
+
+    (4, 'Secondary indexes for hot student and tutor queries', [
+        # Session catalog: status = 'active' AND date >= CURDATE() ORDER BY date, start_time
+        "CREATE INDEX idx_sessions_status_date ON sessions (status, date, start_time)",
+        # Tutor dashboards and conflict checks: tutor_id = ? AND date = ? AND status = 'active'
+        "CREATE INDEX idx_sessions_tutor_date ON sessions (tutor_id, date, status, start_time)",
+        # My Schedule: sessions created from a fulfilled request
+        "CREATE INDEX idx_sessions_request ON sessions (request_id, status, date)",
+        # Per-student registrations (duplicate/conflict checks, schedule, cancel)
+        "CREATE INDEX idx_registrations_student ON registrations (student_id, status, session_id)",
+        # Per-session seat counts
+        "CREATE INDEX idx_registrations_session ON registrations (session_id, status, student_id)",
+        # Pending request lookup and dedup in _create_new_request
+        "CREATE INDEX idx_requests_status_topic ON session_requests (status, subject, topic, level)",
+        # Requests a student takes part in
+        "CREATE INDEX idx_participations_student ON request_participations (student_id, request_id)"
+    ]),
+
+    (5, 'Catalog search indexes', [
+        # Free-text search over topic and details
+        "CREATE FULLTEXT INDEX ft_sessions_topic_details ON sessions (topic, details)",
+        # Subject filter keeps the catalog order without a filesort
+        "CREATE INDEX idx_sessions_subject_date ON sessions (status, subject, date, start_time)",
+        # Level and mode filters (replaced by one index per filter in migration 16)
+        "CREATE INDEX idx_sessions_level_mode_date ON sessions (status, level, mode, date, start_time)",
+        # Tutor filter by name prefix
+        "CREATE INDEX idx_tutors_name ON tutors (name)"
+    ]),
+
+    (6, 'Maintained registration_count on sessions', [
+        "ALTER TABLE sessions ADD COLUMN registration_count INT NOT NULL DEFAULT 0",
+        '''UPDATE sessions s
+            JOIN (
+                SELECT session_id, COUNT(*) AS registered
+                FROM registrations
+                WHERE status = 'registered'
+                GROUP BY session_id
+            ) r ON r.session_id = s.session_id
+            SET s.registration_count = r.registered'''
+    ]),
+
+    (7, 'Maintained participant_count on session_requests', [
+        "ALTER TABLE session_requests ADD COLUMN participant_count INT NOT NULL DEFAULT 0",
+        '''UPDATE session_requests sr
+            JOIN (
+                SELECT request_id, COUNT(*) AS participants
+                FROM request_participations
+                GROUP BY request_id
+            ) rp ON rp.request_id = sr.request_id
+            SET sr.participant_count = rp.participants''',
+        # Most-demanded pending requests first
+        "CREATE INDEX idx_requests_status_demand ON session_requests (status, participant_count, request_date)"
+    ]),
+
+    (8, 'Normalized dedup key with a unique index on pending requests', [
+        "ALTER TABLE session_requests ADD COLUMN dedup_key VARCHAR(130) NULL",
+        # Same normalization as normalize_request_key(): trim, collapse spaces, lower case
+        '''UPDATE session_requests
+            SET dedup_key = LOWER(CONCAT_WS('|',
+                REGEXP_REPLACE(TRIM(subject), '[[:space:]]+', ' '),
+                REGEXP_REPLACE(TRIM(topic), '[[:space:]]+', ' '),
+                REGEXP_REPLACE(TRIM(level), '[[:space:]]+', ' ')))''',
+        # Merge pending duplicates created before the key existed into one request
+        '''CREATE TEMPORARY TABLE request_merge AS
+            SELECT sr.request_id, k.keeper
+            FROM session_requests sr
+            JOIN (
+                SELECT dedup_key, MIN(request_id) AS keeper
+                FROM session_requests
+                WHERE status = 'pending'
+                GROUP BY dedup_key
+                HAVING COUNT(*) > 1
+            ) k ON k.dedup_key = sr.dedup_key
+            WHERE sr.status = 'pending' AND sr.request_id <> k.keeper
+        ''',
+        '''INSERT IGNORE INTO request_participations (request_id, student_id)
+            SELECT m.keeper, rp.student_id
+            FROM request_participations rp
+            JOIN request_merge m ON m.request_id = rp.request_id''',
+        '''UPDATE session_requests sr
+            JOIN request_merge m ON m.request_id = sr.request_id
+            SET sr.status = 'merged'
+        ''',
+        '''UPDATE session_requests sr
+            JOIN (
+                SELECT request_id, COUNT(*) AS participants
+                FROM request_participations
+                GROUP BY request_id
+            ) rp ON rp.request_id = sr.request_id
+            SET sr.participant_count = rp.participants
+            WHERE sr.status = 'pending'
+        ''',
+        "DROP TEMPORARY TABLE request_merge",
+        # MySQL has no partial indexes: a generated column that is NULL unless
+        # pending gives "unique among pending requests"
+        '''ALTER TABLE session_requests
+            ADD COLUMN pending_dedup_key VARCHAR(130)
+                AS (IF(status = 'pending', dedup_key, NULL)) STORED,
+            ADD UNIQUE KEY uq_requests_pending_dedup (pending_dedup_key)'''
+    ]),
+
+    (9, 'Materialized per-student schedule', [
+        '''CREATE TABLE IF NOT EXISTS student_schedule (
+            student_id VARCHAR(20) NOT NULL,
+            date DATE NOT NULL,
+            start_time TIME NOT NULL,
+            session_id VARCHAR(20) NOT NULL,
+            registration_date DATE,
+            request_id VARCHAR(20),
+            request_date DATE,
+            PRIMARY KEY (student_id, date, start_time, session_id),
+            UNIQUE KEY uq_schedule_student_session (student_id, session_id),
+            KEY idx_schedule_session (session_id),
+            KEY idx_schedule_date (date)
+        )''',
+        # Sessions from fulfilled requests first so they keep their request details
+        '''INSERT IGNORE INTO student_schedule
+            (student_id, date, start_time, session_id, request_id, request_date)
+            SELECT rp.student_id, s.date, s.start_time, s.session_id, sr.request_id, sr.request_date
+            FROM request_participations rp
+            JOIN session_requests sr ON rp.request_id = sr.request_id
+            JOIN sessions s ON sr.request_id = s.request_id
+            WHERE sr.status = 'fulfilled' AND s.date >= CURDATE()''',
+        '''INSERT IGNORE INTO student_schedule
+            (student_id, date, start_time, session_id, registration_date)
+            SELECT r.student_id, s.date, s.start_time, s.session_id, r.registration_date
+            FROM registrations r
+            JOIN sessions s ON r.session_id = s.session_id
+            WHERE r.status = 'registered' AND s.date >= CURDATE()'''
+    ]),
+
+    (10, 'History tables for archived sessions', [
+        # Same columns and keys as the hot tables (LIKE copies no foreign keys),
+        # so archive.py can move rows with INSERT ... SELECT *
+        "CREATE TABLE IF NOT EXISTS sessions_history LIKE sessions",
+        "CREATE TABLE IF NOT EXISTS registrations_history LIKE registrations",
+        "CREATE TABLE IF NOT EXISTS session_updates_history LIKE session_updates",
+        "CREATE TABLE IF NOT EXISTS cancellations_history LIKE cancellations",
+        # History is never searched by text, only listed per student or tutor
+        "ALTER TABLE sessions_history DROP INDEX ft_sessions_topic_details"
+    ]),
+
+    (11, 'Compact change log with one JSON diff per session edit', [
+        '''CREATE TABLE IF NOT EXISTS session_changes (
+            change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            session_id VARCHAR(20) NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            changes JSON NOT NULL,
+            KEY idx_changes_session (session_id, changed_at),
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )''',
+        "CREATE TABLE IF NOT EXISTS session_changes_history LIKE session_changes",
+        # Per-field session_updates rows written by the same edit share a timestamp;
+        # edits already copied by an interrupted run are left alone
+        '''INSERT INTO session_changes (session_id, changed_at, changes)
+            SELECT u.session_id, u.update_timestamp,
+                   JSON_OBJECTAGG(u.field_name, JSON_ARRAY(u.old_value, u.new_value))
+            FROM session_updates u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM session_changes c
+                WHERE c.session_id = u.session_id AND c.changed_at = u.update_timestamp
+            )
+            GROUP BY u.session_id, u.update_timestamp''',
+        '''INSERT INTO session_changes_history (session_id, changed_at, changes)
+            SELECT u.session_id, u.update_timestamp,
+                   JSON_OBJECTAGG(u.field_name, JSON_ARRAY(u.old_value, u.new_value))
+            FROM session_updates_history u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM session_changes_history c
+                WHERE c.session_id = u.session_id AND c.changed_at = u.update_timestamp
+            )
+            GROUP BY u.session_id, u.update_timestamp'''
+    ]),
+
+    (12, 'Session capacity and waitlist', [
+        # NULL means no seat limit; history keeps the same columns as sessions
+        "ALTER TABLE sessions ADD COLUMN capacity INT NULL",
+        "ALTER TABLE sessions_history ADD COLUMN capacity INT NULL",
+        '''CREATE TABLE IF NOT EXISTS session_waitlist (
+            waitlist_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            session_id VARCHAR(20) NOT NULL,
+            student_id VARCHAR(20) NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_waitlist_session_student (session_id, student_id),
+            KEY idx_waitlist_session_order (session_id, waitlist_id),
+            KEY idx_waitlist_student (student_id),
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id),
+            FOREIGN KEY (student_id) REFERENCES students(student_id)
+        )'''
+    ]),
+
+    (13, 'Idempotency keys for retried write transactions', [
+        '''CREATE TABLE IF NOT EXISTS idempotency_keys (
+            idem_key VARCHAR(64) PRIMARY KEY,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            result JSON NULL,
+            KEY idx_idempotency_created (created_at)
+        )'''
+    ]),
+
+    (14, 'Subjects and levels each tutor teaches', [
+        '''CREATE TABLE IF NOT EXISTS tutor_subjects (
+            tutor_id VARCHAR(20) NOT NULL,
+            subject VARCHAR(50) NOT NULL,
+            level VARCHAR(20) NOT NULL,
+            PRIMARY KEY (tutor_id, subject, level),
+            KEY idx_tutor_subjects_subject (subject, level, tutor_id),
+            FOREIGN KEY (tutor_id) REFERENCES tutors(tutor_id)
+        )'''
+    ]),
+
+    (15, 'Recurring session series', [
+        '''CREATE TABLE IF NOT EXISTS session_series (
+            series_id VARCHAR(20) PRIMARY KEY,
+            tutor_id VARCHAR(20) NOT NULL,
+            every_days INT NOT NULL,
+            first_date DATE NOT NULL,
+            last_date DATE NOT NULL,
+            occurrences INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_series_tutor (tutor_id),
+            FOREIGN KEY (tutor_id) REFERENCES tutors(tutor_id)
+        )''',
+        "ALTER TABLE sessions ADD COLUMN series_id VARCHAR(20) NULL",
+        "ALTER TABLE sessions_history ADD COLUMN series_id VARCHAR(20) NULL",
+        "CREATE INDEX idx_sessions_series ON sessions (series_id, status, date)"
+    ]),
+
+    (16, 'One catalog index per filter, in page order', [
+        # Each filter used alone seeks its value and reads rows already in
+        # (date, start_time, session_id) order, so a page stops after LIMIT rows
+        "DROP INDEX idx_sessions_subject_date ON sessions",
+        "DROP INDEX idx_sessions_level_mode_date ON sessions",
+        "CREATE INDEX idx_sessions_subject_date ON sessions (status, subject, date, start_time, session_id)",
+        "CREATE INDEX idx_sessions_level_date ON sessions (status, level, date, start_time, session_id)",
+        "CREATE INDEX idx_sessions_mode_date ON sessions (status, mode, date, start_time, session_id)",
+        # Topic prefix search: a range on topic, sorted afterwards
+        "CREATE INDEX idx_sessions_topic_date ON sessions (status, topic, date, start_time, session_id)"
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    """Returns the applied schema version, or 0 for a database that was never migrated"""
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return 0
+        raise
+    return cursor.fetchone()[0] or 0
+
+
+def migrate(connection):
+    """Brings the schema up to LATEST_VERSION and returns the list of versions applied"""
+    cursor = connection.cursor()
+    try:
+        # Fast path: one round trip when the schema is already current
+        if current_version(cursor) >= LATEST_VERSION:
+            return []
+
+        # Slow path: serialize migrating processes with a named lock
+        cursor.execute("SELECT GET_LOCK(%s, 60)", (MIGRATION_LOCK,))
+        if cursor.fetchone()[0] != 1:
+            raise Error(msg="Timed out waiting for the schema migration lock")
+
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(100) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Re-read under the lock in case another process just migrated
+            version = current_version(cursor)
+            applied = []
+            for number, description, statements in MIGRATIONS:
+                if number <= version:
+                    continue
+
+                for statement in statements:
+                    try:
+                        cursor.execute(statement)
+                    except Error as e:
+                        if e.errno not in ALREADY_APPLIED:
+                            raise
+
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (number, description)
+                )
+                connection.commit()
+                applied.append((number, description))
+
+            return applied
+
+        finally:
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
+
+    finally:
+        cursor.close()
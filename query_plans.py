@@ -0,0 +1,120 @@
+"""
+   EXPLAIN-based check for the hot queries of the student and tutor flows.
+
+   Run `python query_plans.py` against a database with representative data.
+   It exits non-zero when any hot query falls back to a full table or index scan.
+"""
+import datetime
+import sys
+
+from mysql.connector import Error
+
+import archive
+import audit
+import conflicts
+import matching
+import schedule
+import seats
+import series
+import services
+import slots
+
+TODAY = datetime.date.today()
+DAY = datetime.timedelta(days=1)
+
+# Catalog filters, alone and combined; each is checked on the first page and
+# on a later page reached through the keyset
+CATALOG_FILTERS = [
+    ('no filters', {}),
+    ('subject', {'subject': 'Math'}),
+    ('topic prefix', {'topic': 'Calc'}),
+    ('level', {'level': 'Beginner'}),
+    ('mode', {'mode': 'Online'}),
+    ('tutor name prefix', {'tutor': 'Bon'}),
+    ('date range', {'date_from': TODAY, 'date_to': TODAY + 7 * DAY}),
+    ('free text', {'text': 'calculus'}),
+    ('level + mode', {'level': 'Beginner', 'mode': 'Online'}),
+]
+CATALOG_AFTER = (TODAY, '09:00', 'sess_001')
+
+# (name, query, sample parameters) for each query that runs on a hot path,
+# built by the same functions the application runs them with
+HOT_QUERIES = [
+    entry
+    for name, filters in CATALOG_FILTERS
+    for entry in (
+        (f'session catalog ({name})', *services.catalog_query(filters=filters)),
+        (f'session catalog ({name}), later page', *services.catalog_query(CATALOG_AFTER, filters=filters)),
+    )
+] + [
+    ('session details', *services.session_details_query('sess_001')),
+    ('tutor scheduled sessions', *services.tutor_sessions_query('ttr_001')),
+    ('tutor time conflicts', *conflicts.tutor_conflicts_query('ttr_001', TODAY - DAY, TODAY)),
+    ('student time conflicts', *services.registered_on_dates_query('st_001', [TODAY - DAY, TODAY, TODAY + DAY])),
+    ('duplicate registration check', *services.registered_among_query('st_001', ['sess_001', 'sess_002'])),
+    ('student registrations', *services.student_registrations_query('st_001')),
+    ('pending request dedup', *services.request_dedup_query('math|calculus|beginner')),
+    ('most-demanded pending requests', *services.pending_requests_query(10)),
+    ('student schedule', *schedule.schedule_query('st_001')),
+    ('tutors for matched subjects', *matching.expertise_query(['Math', 'Physics'])),
+    ('pending requests in tutor subjects', *matching.pending_for_subjects_query(['Math', 'Physics'])),
+    ('upcoming load of matched tutors', *matching.tutor_loads_query(['ttr_001', 'ttr_002'])),
+    ('request participants busy window', *slots.participant_busy_query('req_001', TODAY - DAY, TODAY + 13 * DAY)),
+    ('tutor busy window', *slots.tutor_busy_query('ttr_001', TODAY - DAY, TODAY + 13 * DAY)),
+    ('series conflict check', *series.series_conflicts_query('ttr_001', [TODAY, TODAY + 7 * DAY, TODAY + 14 * DAY])),
+    ('series upcoming occurrences', *series.upcoming_occurrences_query('ser_001', 'ttr_001', lock=True)),
+    ('waitlist head', *seats.waitlist_head_query('sess_001')),
+    ('session change history', *audit.session_history_query('sess_001')),
+    ('archive candidates', *archive.archive_candidates_query(archive.archive_cutoff())),
+    ('tutor past sessions', *archive.past_sessions_for_tutor_query('ttr_001')),
+    ('student past sessions', *archive.past_sessions_for_student_query('st_001')),
+]
+
+
+def full_scans(cursor, query, params):
+    """Returns the tables that EXPLAIN reports as read with a full table or full index scan"""
+    cursor.execute("EXPLAIN " + query, params)
+    scans = []
+    for row in cursor.fetchall():
+        table = row['table'] or ''
+        # <unionN,M> / <derivedN> are temporary results, not stored tables
+        if table.startswith('<'):
+            continue
+        # 'index' walks every entry of an index, which grows with the table just like 'ALL'
+        if row['type'] in ('ALL', 'index'):
+            scans.append(table)
+    return scans
+
+
+def check_query_plans(connection, queries=None):
+    """Runs EXPLAIN for each hot query and returns {query name: [scanned tables]} for failures"""
+    failures = {}
+    cursor = connection.cursor(dictionary=True)
+    try:
+        for name, query, params in queries or HOT_QUERIES:
+            scans = full_scans(cursor, query, params)
+            if scans:
+                failures[name] = scans
+    finally:
+        cursor.close()
+    return failures
+
+
+if __name__ == "__main__":
+    from main import TutoringSystem
+
+    try:
+        system = TutoringSystem()
+        with system.get_connection() as connection:
+            failures = check_query_plans(connection)
+    except Error as e:
+        print(f"Query plan check failed to run: {e}")
+        sys.exit(2)
+
+    if failures:
+        print("Hot queries falling back to full scans:")
+        for name, tables in failures.items():
+            print(f"- {name}: {', '.join(tables)}")
+        sys.exit(1)
+
+    print(f"All {len(HOT_QUERIES)} hot queries use an index.")
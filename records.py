@@ -0,0 +1,160 @@
+"""
+   Compact typed rows for listings.
+
+   A dictionary cursor builds one dict per row with every column name as a
+   key. The record types here keep a row as one list of values behind
+   __slots__, so the column names live once on the class. Listings read
+   through a raw tuple cursor, which skips the connector's per-value type
+   conversion; a value is converted from its raw bytes the first time it is
+   read and cached in place, so columns that are never shown cost nothing.
+
+   Records behave like the dicts they replace for reading (row['subject'],
+   row.get(...), dict(row)) and also expose fields as attributes
+   (row.subject). Each record type lists its columns once as
+   (name, SQL expression, converter); `columns()` renders the SELECT list so
+   queries and records cannot drift apart.
+"""
+import datetime
+
+
+def _text(raw):
+    return raw.decode('utf-8')
+
+
+def _date(raw):
+    return datetime.date.fromisoformat(raw.decode())
+
+
+def _datetime(raw):
+    return datetime.datetime.fromisoformat(raw.decode())
+
+
+def _time(raw):
+    # TIME comes back as a timedelta from the converting cursors, so keep that type
+    hours, minutes, seconds = raw.decode().split(':')
+    sign = -1 if hours.startswith('-') else 1
+    return sign * datetime.timedelta(hours=abs(int(hours)), minutes=int(minutes), seconds=float(seconds))
+
+
+class Record:
+    """Base of the typed rows; subclasses set FIELDS and an empty __slots__"""
+
+    __slots__ = ('_values',)
+
+    # ((name, SQL expression, converter), ...) in SELECT order. Expressions
+    # use {s} sessions, {t} tutors, {r} registrations, {ss} student_schedule
+    # and {sr} session_requests as table aliases.
+    FIELDS = ()
+    ALIASES = {'s': 's', 't': 't', 'r': 'r', 'ss': 'ss', 'sr': 'sr'}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._INDEX = {name: idx for idx, (name, _, _) in enumerate(cls.FIELDS)}
+        cls._CONVERTERS = tuple(convert for _, _, convert in cls.FIELDS)
+        for idx, (name, _, _) in enumerate(cls.FIELDS):
+            setattr(cls, name, property(lambda self, idx=idx: self._value(idx)))
+
+    def __init__(self, values):
+        self._values = list(values)
+
+    @classmethod
+    def columns(cls, **aliases):
+        """Renders the SELECT list, optionally with other table aliases"""
+        aliases = dict(cls.ALIASES, **aliases)
+        return ', '.join(f"{expression.format(**aliases)} AS {name}" for name, expression, _ in cls.FIELDS)
+
+    def _value(self, idx):
+        value = self._values[idx]
+        if isinstance(value, (bytes, bytearray)):
+            value = self._values[idx] = self._CONVERTERS[idx](value)
+        return value
+
+    def __getitem__(self, name):
+        return self._value(self._INDEX[name])
+
+    def get(self, name, default=None):
+        idx = self._INDEX.get(name)
+        return default if idx is None else self._value(idx)
+
+    def __contains__(self, name):
+        return name in self._INDEX
+
+    def keys(self):
+        return self._INDEX.keys()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={self[name]!r}" for name in self._INDEX)
+        return f"{type(self).__name__}({fields})"
+
+
+class Session(Record):
+    """A session with its tutor's name and email (needs JOIN tutors t)"""
+    __slots__ = ()
+    FIELDS = (
+        ('session_id', '{s}.session_id', _text),
+        ('tutor_id', '{s}.tutor_id', _text),
+        ('subject', '{s}.subject', _text),
+        ('topic', '{s}.topic', _text),
+        ('level', '{s}.level', _text),
+        ('details', '{s}.details', _text),
+        ('date', '{s}.date', _date),
+        ('start_time', '{s}.start_time', _time),
+        ('duration', '{s}.duration', int),
+        ('end_time', '{s}.end_time', _time),
+        ('mode', '{s}.mode', _text),
+        ('status', '{s}.status', _text),
+        ('location', '{s}.location', _text),
+        ('online_link', '{s}.online_link', _text),
+        ('capacity', '{s}.capacity', int),
+        ('registration_count', '{s}.registration_count', int),
+        ('series_id', '{s}.series_id', _text),
+        ('tutor_name', '{t}.name', _text),
+        ('tutor_email', '{t}.email', _text),
+    )
+
+
+class Registration(Session):
+    """A session the student is registered for (needs JOIN registrations r)"""
+    __slots__ = ()
+    FIELDS = Session.FIELDS + (
+        ('registration_id', '{r}.registration_id', int),
+        ('registration_date', '{r}.registration_date', _date),
+    )
+
+
+class ScheduleEntry(Session):
+    """A row of the student's materialized schedule (needs student_schedule ss)"""
+    __slots__ = ()
+    FIELDS = Session.FIELDS + (
+        ('registration_date', '{ss}.registration_date', _date),
+        ('request_id', '{ss}.request_id', _text),
+        ('request_date', '{ss}.request_date', _date),
+    )
+
+
+class Request(Record):
+    __slots__ = ()
+    FIELDS = (
+        ('request_id', '{sr}.request_id', _text),
+        ('student_id', '{sr}.student_id', _text),
+        ('subject', '{sr}.subject', _text),
+        ('topic', '{sr}.topic', _text),
+        ('level', '{sr}.level', _text),
+        ('details', '{sr}.details', _text),
+        ('request_date', '{sr}.request_date', _date),
+        ('status', '{sr}.status', _text),
+        ('participant_count', '{sr}.participant_count', int),
+    )
+
+
+def fetch_records(connection, record_type, query, params=(), buffered=True):
+    """Runs a query selecting record_type.columns() and returns the rows as records"""
+    cursor = connection.cursor(raw=True, buffered=buffered)
+    try:
+        cursor.execute(query, params)
+        return [record_type(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
@@ -0,0 +1,106 @@
+"""
+   Materialized per-student schedule.
+
+   student_schedule holds one row per (student, session) the student will
+   attend, keyed by (student_id, date, start_time, session_id), so "My
+   Schedule" is a single primary-key range scan. Every write path that
+   changes what a student attends calls one of the helpers below inside its
+   own transaction.
+"""
+from records import ScheduleEntry, fetch_records
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def add_registrations(cursor, student_id, session_ids):
+    """Adds schedule rows for sessions the student just registered for"""
+    if not session_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    cursor.execute(f'''
+        INSERT INTO student_schedule (student_id, session_id, date, start_time, registration_date)
+        SELECT %s, s.session_id, s.date, s.start_time, CURDATE()
+        FROM sessions s
+        WHERE s.session_id IN ({placeholders})
+        ON DUPLICATE KEY UPDATE registration_date = VALUES(registration_date)
+    ''', [student_id] + list(session_ids))
+
+
+def add_request_participants(cursor, request_id, session_id):
+    """Adds schedule rows for every participant of a request fulfilled by session_id"""
+    cursor.execute('''
+        INSERT INTO student_schedule (student_id, session_id, date, start_time, request_id, request_date)
+        SELECT rp.student_id, s.session_id, s.date, s.start_time, sr.request_id, sr.request_date
+        FROM request_participations rp
+        JOIN session_requests sr ON sr.request_id = rp.request_id
+        JOIN sessions s ON s.session_id = %s
+        WHERE rp.request_id = %s
+        ON DUPLICATE KEY UPDATE request_id = VALUES(request_id), request_date = VALUES(request_date)
+    ''', (session_id, request_id))
+
+
+def remove_registrations(cursor, student_id, session_ids):
+    """Removes schedule rows for sessions the student cancelled"""
+    if not session_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    cursor.execute(f'''
+        DELETE FROM student_schedule
+        WHERE student_id = %s AND session_id IN ({placeholders})
+    ''', [student_id] + list(session_ids))
+
+
+def move_session(cursor, session_id, date, start_time):
+    """Keeps schedule rows in step when a tutor moves a session"""
+    cursor.execute('''
+        UPDATE student_schedule SET date = %s, start_time = %s WHERE session_id = %s
+    ''', (date, start_time, session_id))
+
+
+def resync_sessions(cursor, session_ids):
+    """Copies date and start_time from sessions into the schedule rows of many moved sessions"""
+    if not session_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    cursor.execute(f'''
+        UPDATE student_schedule ss
+        JOIN sessions s ON s.session_id = ss.session_id
+        SET ss.date = s.date, ss.start_time = s.start_time
+        WHERE ss.session_id IN ({placeholders})
+    ''', list(session_ids))
+
+
+def schedule_query(student_id):
+    """(query, params) reading the student's upcoming sessions in date order"""
+    return f'''
+        SELECT {ScheduleEntry.columns()}
+        FROM student_schedule ss
+        JOIN sessions s ON s.session_id = ss.session_id
+        JOIN tutors t ON s.tutor_id = t.tutor_id
+        WHERE ss.student_id = %s AND ss.date >= CURDATE()
+        AND s.status = 'active'
+        ORDER BY ss.date, ss.start_time
+    ''', (student_id,)
+
+
+def fetch_schedule(connection, student_id):
+    """Returns the student's upcoming sessions with one indexed range scan"""
+    return fetch_records(connection, ScheduleEntry, *schedule_query(student_id))
+
+
+def prune_expired(connection, batch_size=PRUNE_BATCH_SIZE):
+    """Deletes schedule rows whose date has passed, in short batches; returns rows removed"""
+    removed = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM student_schedule WHERE date < CURDATE() LIMIT %s", (batch_size,)
+            )
+            connection.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+    finally:
+        cursor.close()
+    return removed
@@ -0,0 +1,103 @@
+"""
+   Seat allocation for sessions with a capacity.
+
+   A seat is taken with one conditional UPDATE of sessions.registration_count
+   (`... WHERE registration_count < capacity`). InnoDB serializes concurrent
+   claims on the session row, so a session can never be oversold and the row
+   lock is held only for the few statements between the claim and COMMIT.
+   A NULL capacity means unlimited seats. When a session is full, students
+   can join its waitlist; every cancellation promotes the first student
+   waiting for that session in the same transaction.
+"""
+import datetime
+
+import schedule
+
+
+def claim_seat(cursor, session_id):
+    """Takes one seat of an active session; returns False when it is full"""
+    cursor.execute('''
+        UPDATE sessions SET registration_count = registration_count + 1
+        WHERE session_id = %s AND status = 'active'
+        AND (capacity IS NULL OR registration_count < capacity)
+    ''', (session_id,))
+    return cursor.rowcount == 1
+
+
+def add_registrations(cursor, student_id, session_ids):
+    """Inserts registrations for seats already claimed, updates the schedule and clears waitlist entries"""
+    if not session_ids:
+        return
+    today = datetime.date.today()
+    # executemany rewrites this into a single multi-row INSERT
+    cursor.executemany('''
+        INSERT INTO registrations (student_id, session_id, registration_date, status)
+        VALUES (%s, %s, %s, 'registered')
+    ''', [(student_id, session_id, today) for session_id in session_ids])
+    schedule.add_registrations(cursor, student_id, session_ids)
+
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    cursor.execute(f'''
+        DELETE FROM session_waitlist WHERE student_id = %s AND session_id IN ({placeholders})
+    ''', [student_id] + list(session_ids))
+
+
+def join_waitlist(cursor, session_id, student_id):
+    """Adds the student to the waitlist of a full active session (once) and returns their position.
+
+    Returns None when the session is not full or the student already holds a seat in it.
+    """
+    cursor.execute('''
+        INSERT IGNORE INTO session_waitlist (session_id, student_id)
+        SELECT s.session_id, %s FROM sessions s
+        WHERE s.session_id = %s AND s.status = 'active'
+        AND s.capacity IS NOT NULL AND s.registration_count >= s.capacity
+        AND NOT EXISTS (
+            SELECT 1 FROM registrations r
+            WHERE r.session_id = s.session_id AND r.status = 'registered' AND r.student_id = %s
+        )
+    ''', (student_id, session_id, student_id))
+    cursor.execute('''
+        SELECT COUNT(*) FROM session_waitlist w
+        JOIN session_waitlist mine ON mine.session_id = w.session_id AND mine.student_id = %s
+        WHERE w.session_id = %s AND w.waitlist_id <= mine.waitlist_id
+    ''', (student_id, session_id))
+    return cursor.fetchone()[0] or None
+
+
+def waitlist_head_query(session_id):
+    """(query, params) locking the first student waiting for a session"""
+    return '''
+        SELECT student_id FROM session_waitlist
+        WHERE session_id = %s
+        ORDER BY waitlist_id
+        LIMIT 1
+        FOR UPDATE
+    ''', (session_id,)
+
+
+def promote_from_waitlist(cursor, session_ids):
+    """Gives each freed seat to the first student waiting for it; returns [(session_id, student_id)]"""
+    promoted = []
+    # Sorted so concurrent cancellations lock sessions in the same order
+    for session_id in sorted(set(session_ids)):
+        # Students who got a seat some other way are no longer waiting
+        cursor.execute('''
+            DELETE w FROM session_waitlist w
+            JOIN registrations r ON r.session_id = w.session_id AND r.student_id = w.student_id
+            WHERE w.session_id = %s AND r.status = 'registered'
+        ''', (session_id,))
+        cursor.execute(*waitlist_head_query(session_id))
+        row = cursor.fetchone()
+        if row is None or not claim_seat(cursor, session_id):
+            continue
+        add_registrations(cursor, row[0], [session_id])
+        promoted.append((session_id, row[0]))
+    return promoted
+
+
+def seats_left(session):
+    """Returns the free seats of a session row, or None when it is unlimited"""
+    if session.get('capacity') is None:
+        return None
+    return max(session['capacity'] - session['registration_count'], 0)
@@ -0,0 +1,208 @@
+"""
+   Recurring session series.
+
+   A series is a rule (every N days from a first date, until an end date or
+   for a number of occurrences) expanded into ordinary sessions that share a
+   series_id. All occurrences are conflict-checked against the tutor's
+   calendar with one query, inserted with one multi-row INSERT in one
+   transaction, and can later be edited or cancelled together.
+"""
+import datetime
+
+import audit
+import schedule
+from conflicts import overlaps
+from timemodel import neighbour_dates, row_span, session_span
+
+MAX_OCCURRENCES = 52
+CANCEL_REASON = "Series cancelled by the tutor"
+
+# Fields that may be changed for every upcoming occurrence at once
+SERIES_FIELDS = ['subject', 'topic', 'level', 'details', 'start_time', 'duration', 'end_time',
+                 'mode', 'location', 'online_link', 'capacity']
+
+
+def expand_dates(first_date, every_days=7, until=None, count=None, max_occurrences=MAX_OCCURRENCES):
+    """Returns the occurrence dates of a rule, capped at max_occurrences"""
+    if until is None and count is None:
+        raise ValueError("A series needs an end date or a number of occurrences")
+    limit = min(max_occurrences if count is None else count, max_occurrences)
+
+    dates = []
+    date = first_date
+    while len(dates) < limit and (until is None or date <= until):
+        dates.append(date)
+        date += datetime.timedelta(days=every_days)
+    return dates
+
+
+def series_conflicts_query(tutor_id, dates, exclude_series_id=None):
+    """(query, params) reading the tutor's active sessions on the given (non-empty) dates"""
+    query = f'''
+        SELECT session_id, subject, date, start_time, end_time, duration
+        FROM sessions
+        WHERE tutor_id = %s AND status = 'active'
+        AND date IN ({', '.join(['%s'] * len(dates))})
+    '''
+    params = [tutor_id] + list(dates)
+    if exclude_series_id:
+        query += " AND (series_id IS NULL OR series_id <> %s)"
+        params.append(exclude_series_id)
+    query += " ORDER BY date, start_time"
+    return query, params
+
+
+def find_series_conflicts(connection, tutor_id, dates, start_time, duration, exclude_series_id=None):
+    """Returns {date: [conflicting sessions]} for every occurrence, with a single query.
+
+    The query fetches the tutor's sessions on each occurrence date and its
+    neighbours; overlaps are then tested on absolute minute spans, so
+    sessions running past midnight are caught on either side.
+    """
+    if not dates:
+        return {}
+    candidate_dates = sorted({day for date in dates for day in neighbour_dates(date, start_time, duration)})
+
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(*series_conflicts_query(tutor_id, candidate_dates, exclude_series_id))
+        by_date = {}
+        for row in cursor.fetchall():
+            by_date.setdefault(row['date'], []).append(row)
+    finally:
+        cursor.close()
+
+    conflicts = {}
+    for date in dates:
+        start, end = session_span(date, start_time, duration)
+        for day in neighbour_dates(date, start_time, duration):
+            for row in by_date.get(day, ()):
+                if overlaps(start, end, *row_span(row)):
+                    conflicts.setdefault(date, []).append(row)
+    return conflicts
+
+
+def create_series(cursor, series_id, session_ids, session_data, dates, every_days):
+    """Inserts the series and all its sessions (run through system.run_transaction)"""
+    cursor.execute('''
+        INSERT INTO session_series (series_id, tutor_id, every_days, first_date, last_date, occurrences)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    ''', (series_id, session_data['tutor_id'], every_days, dates[0], dates[-1], len(dates)))
+
+    # executemany rewrites this into a single multi-row INSERT
+    cursor.executemany('''
+        INSERT INTO sessions (
+            session_id, tutor_id, subject, topic, level, details,
+            date, start_time, duration, end_time, mode, status,
+            location, online_link, capacity, series_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'active', %s, %s, %s, %s)
+    ''', [
+        (
+            session_id, session_data['tutor_id'], session_data['subject'],
+            session_data['topic'], session_data['level'], session_data['details'],
+            date, session_data['start_time'], session_data['duration'],
+            session_data['end_time'], session_data['mode'],
+            session_data['location'], session_data['online_link'], session_data['capacity'], series_id
+        )
+        for session_id, date in zip(session_ids, dates)
+    ])
+
+
+def fetch_tutor_series(connection, tutor_id):
+    """Returns the tutor's series that still have upcoming active sessions"""
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute('''
+            SELECT ss.series_id, ss.every_days, MIN(s.date) AS next_date, COUNT(*) AS upcoming,
+                   MIN(s.subject) AS subject, MIN(s.topic) AS topic,
+                   MIN(s.start_time) AS start_time, MIN(s.end_time) AS end_time
+            FROM session_series ss
+            JOIN sessions s ON s.series_id = ss.series_id
+            WHERE ss.tutor_id = %s AND s.status = 'active' AND s.date >= CURDATE()
+            GROUP BY ss.series_id, ss.every_days
+            ORDER BY next_date
+        ''', (tutor_id,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def upcoming_occurrences_query(series_id, tutor_id, lock=False):
+    """(query, params) reading the upcoming active sessions of a series, optionally locking them"""
+    return f'''
+        SELECT * FROM sessions
+        WHERE series_id = %s AND tutor_id = %s AND status = 'active' AND date >= CURDATE()
+        ORDER BY date
+        {'FOR UPDATE' if lock else ''}
+    ''', (series_id, tutor_id)
+
+
+def fetch_upcoming_occurrences(cursor, series_id, tutor_id, lock=False):
+    """Returns the upcoming active sessions of a series, optionally locking them"""
+    cursor.execute(*upcoming_occurrences_query(series_id, tutor_id, lock))
+    return cursor.fetchall()
+
+
+def update_series(cursor, series_id, tutor_id, updates, write_audit=True):
+    """Applies the same field updates to every upcoming occurrence; returns (session_ids, diffs).
+
+    Needs a dictionary cursor. Occurrences the updates would not change are
+    left alone; one change-log row per changed session is written with a
+    single multi-row INSERT unless the caller hands auditing to the
+    background writer.
+    """
+    unknown = set(updates) - set(SERIES_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot update {', '.join(sorted(unknown))} for a whole series")
+
+    sessions = fetch_upcoming_occurrences(cursor, series_id, tutor_id, lock=True)
+    if not sessions:
+        return [], {}
+
+    diffs = {session['session_id']: audit.build_diff(session, updates) for session in sessions}
+    diffs = {session_id: diff for session_id, diff in diffs.items() if diff}
+    session_ids = list(diffs)
+    if not session_ids:
+        return [], {}
+    if write_audit:
+        audit.write_changes(cursor, [audit.change_row(session_id, diff) for session_id, diff in diffs.items()])
+
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    set_clause = ', '.join(f"{field} = %s" for field in updates)
+    cursor.execute(
+        f"UPDATE sessions SET {set_clause} WHERE session_id IN ({placeholders})",
+        list(updates.values()) + session_ids
+    )
+    if 'start_time' in updates:
+        schedule.resync_sessions(cursor, session_ids)
+    return session_ids, diffs
+
+
+def cancel_series(cursor, series_id, tutor_id):
+    """Cancels every upcoming occurrence and releases their registrations; returns the session IDs.
+
+    Needs a dictionary cursor.
+    """
+    sessions = fetch_upcoming_occurrences(cursor, series_id, tutor_id, lock=True)
+    session_ids = [session['session_id'] for session in sessions]
+    if not session_ids:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    cursor.execute(
+        f"UPDATE sessions SET status = 'cancelled', registration_count = 0 WHERE session_id IN ({placeholders})",
+        session_ids
+    )
+    # Recorded like a student's own cancellation, before the seats are released
+    cursor.execute(f'''
+        INSERT INTO cancellations (session_id, student_id, reason)
+        SELECT session_id, student_id, %s FROM registrations
+        WHERE session_id IN ({placeholders}) AND status = 'registered'
+    ''', [CANCEL_REASON] + session_ids)
+    cursor.execute(f'''
+        UPDATE registrations SET status = 'cancelled'
+        WHERE session_id IN ({placeholders}) AND status = 'registered'
+    ''', session_ids)
+    for table in ('student_schedule', 'session_waitlist'):
+        cursor.execute(f"DELETE FROM {table} WHERE session_id IN ({placeholders})", session_ids)
+    return session_ids
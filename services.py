@@ -0,0 +1,1098 @@
+"""
+   Headless service layer.
+
+   Every use case the menus offer (accounts and login, posting and updating
+   sessions and series, requests and fulfilling them, registering and
+   cancelling) as plain functions. Each takes the TutoringSystem (for the
+   pool, transaction runner, ID allocator and session cache) and explicit
+   arguments, never prompts or prints, and either returns its result or
+   raises: a ServiceError subclass when the rules reject the call (the
+   message is fit to show a user), mysql.connector.Error when the database
+   fails. student.py and tutor.py are terminal clients over these functions;
+   scripts, load tests or another front end can call them directly. Writes
+   that a client may resubmit accept an idempotency_key.
+"""
+import datetime
+import hmac
+import re
+
+from mysql.connector import Error
+
+import archive
+import audit
+import matching
+import schedule
+import seats
+import series
+import slots
+from conflicts import IntervalIndex, find_tutor_conflicts
+from records import Registration, Request, Session, fetch_records
+from timemodel import MAX_DURATION, end_time, format_minutes, neighbour_dates, row_span, to_minutes
+
+ROLES = {'student': ('st_', 'students'), 'tutor': ('ttr_', 'tutors')}
+LEVELS = matching.LEVELS
+MODES = ['Online', 'In-person']
+
+CATALOG_PAGE_SIZE = 10
+
+# Fields a tutor may change on one session, and on every upcoming session of a series
+SESSION_FIELDS = ['subject', 'topic', 'level', 'details', 'date', 'start_time', 'duration',
+                  'mode', 'location', 'online_link', 'capacity']
+SERIES_UPDATE_FIELDS = ['subject', 'topic', 'level', 'details', 'start_time', 'duration', 'capacity']
+
+
+class ServiceError(Exception):
+    """A call the business rules reject"""
+
+
+class InvalidInput(ServiceError):
+    pass
+
+
+class NotFound(ServiceError):
+    pass
+
+
+class NotAllowed(ServiceError):
+    pass
+
+
+class AuthenticationFailed(ServiceError):
+    pass
+
+
+class AccountExists(ServiceError):
+    pass
+
+
+class TimeConflict(ServiceError):
+    """The slot overlaps existing sessions; `conflicts` holds them"""
+
+    def __init__(self, message, conflicts=()):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+
+# --- Validation -------------------------------------------------------------
+
+def password_problems(password):
+    """Returns the password rules a password breaks (empty when it is acceptable)"""
+    problems = []
+    if len(password) < 5:
+        problems.append("- Must be at least 5 characters")
+    if not re.search(r"[A-Z]", password):
+        problems.append("- Must include at least one uppercase letter")
+    if not re.search(r"[a-z]", password):
+        problems.append("- Must include at least one lowercase letter")
+    if not re.search(r"\d", password):
+        problems.append("- Must include at least one number")
+    return problems
+
+
+def _text(value, label):
+    value = (value or '').strip()
+    if not value:
+        raise InvalidInput(f"{label} cannot be empty")
+    return value
+
+
+def _level(value):
+    level = (value or '').strip().capitalize()
+    if level not in LEVELS:
+        raise InvalidInput("Level must be Beginner, Intermediate or Advanced")
+    return level
+
+
+def _date(value, future=True):
+    try:
+        date = value if isinstance(value, datetime.date) else datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise InvalidInput(f"Invalid date {value!r}, expected YYYY-MM-DD") from None
+    if future and date <= datetime.date.today():
+        raise InvalidInput("Date must be in the future")
+    return date
+
+
+def _time(value):
+    if isinstance(value, str):
+        try:
+            datetime.datetime.strptime(value.strip(), "%H:%M")
+        except ValueError:
+            raise InvalidInput(f"Invalid time {value!r}, expected HH:MM") from None
+    try:
+        return format_minutes(to_minutes(value))
+    except ValueError:
+        raise InvalidInput(f"Invalid time {value!r}, expected HH:MM") from None
+
+
+def _duration(value):
+    try:
+        duration = int(value)
+    except (TypeError, ValueError):
+        raise InvalidInput("Duration must be a number of minutes") from None
+    if not 0 < duration <= MAX_DURATION:
+        raise InvalidInput(f"Duration must be between 1 and {MAX_DURATION} minutes")
+    return duration
+
+
+def _capacity(value, minimum=1):
+    if value is None or value == '':
+        return None
+    try:
+        capacity = int(value)
+    except (TypeError, ValueError):
+        raise InvalidInput("Capacity must be a number of students") from None
+    if capacity < minimum:
+        raise InvalidInput(f"Capacity must be at least {minimum}")
+    return capacity
+
+
+def _mode(mode, location, online_link):
+    """Returns (mode, location, online_link) with the field the mode does not use cleared"""
+    mode = {'online': 'Online', 'in-person': 'In-person'}.get((mode or '').strip().lower())
+    if mode is None:
+        raise InvalidInput("Mode must be Online or In-person")
+    if mode == 'In-person':
+        return mode, _text(location, "Location"), None
+    return mode, None, _text(online_link, "Online link")
+
+
+def _session_fields(tutor_id, subject, topic, level, details, date, start_time, duration,
+                    mode, location, online_link, capacity):
+    start_time, duration = _time(start_time), _duration(duration)
+    mode, location, online_link = _mode(mode, location, online_link)
+    return {
+        'tutor_id': tutor_id,
+        'subject': _text(subject, "Subject"),
+        'topic': _text(topic, "Topic"),
+        'level': _level(level),
+        'details': details or '',
+        'date': _date(date) if date is not None else None,
+        'start_time': start_time,
+        'duration': duration,
+        'end_time': end_time(start_time, duration),
+        'mode': mode,
+        'location': location,
+        'online_link': online_link,
+        'capacity': _capacity(capacity),
+    }
+
+
+def _slot_taken(error):
+    """True when an insert or update hit the tutor's unique (date, start_time) key"""
+    return "unique_session_time" in str(error)
+
+
+# --- Accounts ---------------------------------------------------------------
+
+def find_accounts(system, email):
+    """Returns [{'id', 'role'}] of the accounts registered with an email"""
+    with system.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute('''
+                SELECT student_id AS id, 'student' AS role FROM students WHERE email = %s
+                UNION
+                SELECT tutor_id AS id, 'tutor' AS role FROM tutors WHERE email = %s
+            ''', (email, email))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def register_account(system, role, name, email, password, existing=None):
+    """Creates a student or tutor account and returns its ID.
+
+    An email may hold one account per role; AccountExists is raised for a second one.
+    `existing` is the caller's find_accounts() result for the email, if it already has one.
+    """
+    if role not in ROLES:
+        raise InvalidInput(f"Unknown role {role!r}")
+    name = _text(name, "Name")
+    email = _text(email, "Email")
+    if '@' not in email or '.' not in email:
+        raise InvalidInput("Please enter a valid email address.")
+    problems = password_problems(password)
+    if problems:
+        raise InvalidInput("Password does not meet the following criteria:\n" + '\n'.join(problems))
+
+    if existing is None:
+        existing = find_accounts(system, email)
+    if any(account['role'] == role for account in existing):
+        raise AccountExists(f"You already have a {role} account. Please login.")
+
+    user_id = system.generate_id(role)
+    table = ROLES[role][1]
+    system.run_transaction(lambda cursor: cursor.execute(
+        f"INSERT INTO {table} ({role}_id, name, email, password_hash) VALUES (%s, %s, %s, %s)",
+        (user_id, name, email, system.hash_password(password))
+    ))
+    return user_id
+
+
+def login(system, user_id, password):
+    """Checks a user's credentials; returns {'user_id', 'role', 'name'}"""
+    user_id = user_id.strip()
+    role = next((role for role, (prefix, _) in ROLES.items() if user_id.startswith(prefix)), None)
+    if role is None:
+        raise AuthenticationFailed("Invalid ID format")
+
+    with system.get_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"SELECT {role}_id, name, password_hash FROM {ROLES[role][1]} WHERE {role}_id = %s", (user_id,)
+            )
+            user = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    if user is None:
+        raise AuthenticationFailed("ID not found. Please try again or register.")
+    if not hmac.compare_digest(user[2], system.hash_password(password)):
+        raise AuthenticationFailed("Incorrect password")
+    return {'user_id': user[0], 'role': role, 'name': user[1]}
+
+
+# --- Sessions ---------------------------------------------------------------
+
+def session_details_query(session_id):
+    """(query, params) reading one session with its tutor's name"""
+    return '''
+        SELECT s.*, t.name AS tutor_name
+        FROM sessions s
+        JOIN tutors t ON s.tutor_id = t.tutor_id
+        WHERE s.session_id = %s
+    ''', (session_id,)
+
+
+def get_session(system, session_id):
+    """Returns a copy of a session's details (with tutor_name), served from the session cache when possible"""
+    cached = system.session_cache.get(session_id)
+    if cached is not None:
+        return dict(cached)
+
+    with system.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(*session_details_query(session_id))
+            session = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    if session is None:
+        return None
+    system.session_cache.put(session_id, session)
+    return dict(session)
+
+
+def _own_session(system, tutor_id, session_id):
+    session = get_session(system, session_id)
+    if session is None:
+        raise NotFound("Invalid Session ID")
+    if session['tutor_id'] != tutor_id:
+        raise NotAllowed("This is not your session")
+    return session
+
+
+def tutor_sessions_query(tutor_id):
+    """(query, params) reading the tutor's upcoming active sessions in date order"""
+    return f'''
+        SELECT {Session.columns()} FROM sessions s JOIN tutors t ON t.tutor_id = s.tutor_id
+        WHERE s.tutor_id = %s AND s.status = 'active' AND s.date >= CURDATE() ORDER BY s.date, s.start_time
+    ''', (tutor_id,)
+
+
+def tutor_sessions(system, tutor_id):
+    """Returns the tutor's upcoming active sessions in date order"""
+    with system.get_connection() as connection:
+        return fetch_records(connection, Session, *tutor_sessions_query(tutor_id))
+
+
+def tutor_conflicts(system, tutor_id, date, start_time, duration, exclude_session_id=None):
+    """Returns the tutor's active sessions overlapping the given slot"""
+    with system.get_connection() as connection:
+        return find_tutor_conflicts(connection, tutor_id, date, start_time, duration, exclude_session_id)
+
+
+def post_session(system, tutor_id, subject, topic, level, date, start_time, duration, mode,
+                 details='', location=None, online_link=None, capacity=None, idempotency_key=None):
+    """Posts a session and returns its ID; raises TimeConflict if the tutor is busy then"""
+    fields = _session_fields(tutor_id, subject, topic, level, details, date, start_time, duration,
+                             mode, location, online_link, capacity)
+    conflicts = tutor_conflicts(system, tutor_id, fields['date'], fields['start_time'], fields['duration'])
+    if conflicts:
+        raise TimeConflict("This session overlaps with an existing session.", conflicts)
+
+    session_id = system.generate_id('session')
+    try:
+        system.run_transaction(lambda cursor: cursor.execute('''
+            INSERT INTO sessions (
+                session_id, tutor_id, subject, topic, level, details,
+                date, start_time, duration, end_time, mode, status,
+                location, online_link, capacity)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'active', %s, %s, %s)
+        ''', (
+            session_id, tutor_id, fields['subject'], fields['topic'], fields['level'], fields['details'],
+            fields['date'], fields['start_time'], fields['duration'], fields['end_time'], fields['mode'],
+            fields['location'], fields['online_link'], fields['capacity']
+        )), idempotency_key=idempotency_key, idempotent=True)
+    except Error as e:
+        if _slot_taken(e):
+            raise TimeConflict("A session already exists at this date and time.") from e
+        raise
+    return session_id
+
+
+def _row_changes(session, updates, changes):
+    """Adds to validated `changes` the fields that depend on the current session row"""
+    changes = dict(changes)
+    if 'start_time' in changes or 'duration' in changes:
+        changes['end_time'] = end_time(changes.get('start_time', session['start_time']),
+                                       changes.get('duration', session['duration']))
+    if {'mode', 'location', 'online_link'} & set(updates):
+        mode, changes['location'], changes['online_link'] = _mode(
+            updates.get('mode', session['mode']),
+            updates.get('location', session['location']),
+            updates.get('online_link', session['online_link'])
+        )
+        if 'mode' in updates:
+            changes['mode'] = mode
+    if 'capacity' in updates:
+        # A capacity below the seats already taken would strand registered students
+        changes['capacity'] = _capacity(updates['capacity'], max(session['registration_count'], 1))
+    return changes
+
+
+def session_history(system, tutor_id, session_id):
+    """Returns the change log of one of the tutor's sessions, oldest first (see audit.fetch_session_history)"""
+    _own_session(system, tutor_id, session_id)
+    with system.get_connection() as connection:
+        return audit.fetch_session_history(connection, session_id)
+
+
+def session_as_of(system, tutor_id, session_id, when):
+    """Returns one of the tutor's sessions as it was at `when`, rebuilt from its change log"""
+    session = _own_session(system, tutor_id, session_id)
+    with system.get_connection() as connection:
+        history = audit.fetch_session_history(connection, session_id)
+    return audit.session_as_of(session, history, when)
+
+
+def update_session(system, tutor_id, session_id, updates):
+    """Changes fields of one of the tutor's sessions; returns the audit diff ({} when nothing changed).
+
+    `updates` maps SESSION_FIELDS to new values. Switching mode needs the
+    matching location or online_link (the other one is cleared).
+    """
+    unknown = set(updates) - set(SESSION_FIELDS)
+    if unknown:
+        raise InvalidInput(f"Cannot update {', '.join(sorted(unknown))}")
+    session = _own_session(system, tutor_id, session_id)
+
+    changes = {}
+    for field in ('subject', 'topic'):
+        if field in updates:
+            changes[field] = _text(updates[field], field.capitalize())
+    if 'level' in updates:
+        changes['level'] = _level(updates['level'])
+    if 'details' in updates:
+        changes['details'] = updates['details'] or ''
+    if 'date' in updates:
+        changes['date'] = _date(updates['date'])
+    if 'start_time' in updates:
+        changes['start_time'] = _time(updates['start_time'])
+    if 'duration' in updates:
+        changes['duration'] = _duration(updates['duration'])
+
+    if {'date', 'start_time', 'duration'} & set(changes):
+        conflicts = tutor_conflicts(
+            system, tutor_id, changes.get('date', session['date']),
+            changes.get('start_time', session['start_time']),
+            changes.get('duration', session['duration']), exclude_session_id=session_id
+        )
+        if conflicts:
+            raise TimeConflict("This session would overlap with an existing session.", conflicts)
+
+    def apply_update(cursor):
+        # The cached copy may be a minute old: the diff, end time and capacity
+        # floor come from the locked row
+        cursor.execute("SELECT * FROM sessions WHERE session_id = %s FOR UPDATE", (session_id,))
+        current = cursor.fetchone()
+        if current is None:
+            raise NotFound("Invalid Session ID")
+        row_changes = _row_changes(current, updates, changes)
+        diff = audit.build_diff(current, row_changes)
+        if not diff:
+            return diff
+
+        # Record the whole edit as one change-log row (or leave it to the background writer)
+        if system.audit_writer is None:
+            audit.write_changes(cursor, [audit.change_row(session_id, diff)])
+
+        set_clause = ', '.join(f"{field}=%s" for field in row_changes)
+        cursor.execute(
+            f"UPDATE sessions SET {set_clause} WHERE session_id=%s", list(row_changes.values()) + [session_id]
+        )
+        if 'date' in row_changes or 'start_time' in row_changes:
+            schedule.move_session(
+                cursor, session_id,
+                row_changes.get('date', current['date']), row_changes.get('start_time', current['start_time'])
+            )
+        return diff
+
+    try:
+        diff = system.run_transaction(apply_update, dictionary=True)
+    except Error as e:
+        if _slot_taken(e):
+            raise TimeConflict("A session already exists at this date and time.") from e
+        raise
+
+    if not diff:
+        return {}
+    if system.audit_writer is not None:
+        system.audit_writer.submit(session_id, diff)
+    system.invalidate_sessions(session_id)
+    return diff
+
+
+# --- Series -----------------------------------------------------------------
+
+def series_conflicts(system, tutor_id, dates, start_time, duration, exclude_series_id=None):
+    """Returns {date: [conflicting sessions]} for the occurrences of a series"""
+    with system.get_connection() as connection:
+        return series.find_series_conflicts(connection, tutor_id, dates, start_time, duration, exclude_series_id)
+
+
+def series_dates(first_date, every_days=7, until=None, count=None):
+    """Validated series.expand_dates(): the occurrence dates of a repeat rule"""
+    if every_days < 1:
+        raise InvalidInput("A series must repeat at least every day")
+    if count is not None and count < 1:
+        raise InvalidInput("A series needs at least one session")
+    if until is None and count is None:
+        raise InvalidInput("A series needs an end date or a number of sessions")
+    return series.expand_dates(first_date, every_days, until=until, count=count)
+
+
+def post_series(system, tutor_id, dates, every_days, subject, topic, level, start_time, duration, mode,
+                details='', location=None, online_link=None, capacity=None, skip_conflicts=False,
+                idempotency_key=None):
+    """Posts one session per date as a series; returns {'series_id', 'dates', 'skipped'}.
+
+    `dates` comes from series_dates(). Dates that overlap the tutor's
+    sessions raise TimeConflict (conflicts is {date: [sessions]}) unless
+    skip_conflicts drops them.
+    """
+    if not dates:
+        raise InvalidInput("The series has no dates")
+    dates = sorted(_date(date) for date in dates)
+    fields = _session_fields(tutor_id, subject, topic, level, details, None, start_time, duration,
+                             mode, location, online_link, capacity)
+
+    conflicts = series_conflicts(system, tutor_id, dates, fields['start_time'], fields['duration'])
+    if conflicts:
+        if not skip_conflicts:
+            raise TimeConflict(f"{len(conflicts)} of {len(dates)} dates overlap existing sessions.", conflicts)
+        dates = [date for date in dates if date not in conflicts]
+        if not dates:
+            raise TimeConflict("Every date overlaps an existing session.", conflicts)
+
+    series_id = system.generate_id('series')
+    session_ids = [system.generate_id('session') for _ in dates]
+    system.run_transaction(
+        lambda cursor: series.create_series(cursor, series_id, session_ids, fields, dates, every_days),
+        idempotency_key=idempotency_key, idempotent=True
+    )
+    return {'series_id': series_id, 'dates': dates, 'skipped': sorted(conflicts)}
+
+
+def tutor_series(system, tutor_id):
+    """Returns the tutor's series that still have upcoming sessions"""
+    with system.get_connection() as connection:
+        return series.fetch_tutor_series(connection, tutor_id)
+
+
+def update_series(system, tutor_id, series_id, updates):
+    """Applies the same changes to every upcoming session of a series; returns their IDs"""
+    unknown = set(updates) - set(SERIES_UPDATE_FIELDS)
+    if unknown:
+        raise InvalidInput(f"Cannot update {', '.join(sorted(unknown))} for a whole series")
+
+    with system.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            occurrences = series.fetch_upcoming_occurrences(cursor, series_id, tutor_id)
+        finally:
+            cursor.close()
+    if not occurrences:
+        raise NotFound("This series has no upcoming sessions left.")
+
+    changes = {}
+    for field in ('subject', 'topic'):
+        if field in updates:
+            changes[field] = _text(updates[field], field.capitalize())
+    if 'level' in updates:
+        changes['level'] = _level(updates['level'])
+    if 'details' in updates:
+        changes['details'] = updates['details'] or ''
+    if 'start_time' in updates or 'duration' in updates:
+        sample = occurrences[0]
+        changes['start_time'] = _time(updates.get('start_time', sample['start_time']))
+        changes['duration'] = _duration(updates.get('duration', sample['duration']))
+        changes['end_time'] = end_time(changes['start_time'], changes['duration'])
+        conflicts = series_conflicts(
+            system, tutor_id, [row['date'] for row in occurrences],
+            changes['start_time'], changes['duration'], exclude_series_id=series_id
+        )
+        if conflicts:
+            raise TimeConflict("The new time overlaps other sessions.", conflicts)
+    if 'capacity' in updates:
+        fullest = max(row['registration_count'] for row in occurrences)
+        changes['capacity'] = _capacity(updates['capacity'], max(fullest, 1))
+    if not changes:
+        return []
+
+    try:
+        session_ids, diffs = system.run_transaction(
+            lambda cursor: series.update_series(
+                cursor, series_id, tutor_id, changes, write_audit=system.audit_writer is None
+            ),
+            dictionary=True
+        )
+    except Error as e:
+        if _slot_taken(e):
+            raise TimeConflict("Another session already starts at the new time on one of these dates.") from e
+        raise
+    if system.audit_writer is not None:
+        for session_id, diff in diffs.items():
+            system.audit_writer.submit(session_id, diff)
+    system.invalidate_sessions(*session_ids)
+    return session_ids
+
+
+def cancel_series(system, tutor_id, series_id):
+    """Cancels every upcoming session of a series and releases their seats; returns the session IDs"""
+    cancelled = system.run_transaction(
+        lambda cursor: series.cancel_series(cursor, series_id, tutor_id), dictionary=True, idempotent=True
+    )
+    system.invalidate_sessions(*cancelled)
+    return cancelled
+
+
+# --- Tutor subjects ---------------------------------------------------------
+
+def tutor_subjects(system, tutor_id):
+    """Returns [(subject, level)] the tutor teaches"""
+    with system.get_connection() as connection:
+        return matching.fetch_tutor_expertise(connection, tutor_id)
+
+
+def add_subject(system, tutor_id, subject, levels):
+    """Records that the tutor teaches a subject at the given levels; returns the levels"""
+    subject = ' '.join(_text(subject, "Subject").split())
+    levels = sorted({_level(level) for level in levels})
+    if not levels:
+        raise InvalidInput("Pick at least one level")
+    system.run_transaction(lambda cursor: cursor.executemany('''
+        INSERT IGNORE INTO tutor_subjects (tutor_id, subject, level) VALUES (%s, %s, %s)
+    ''', [(tutor_id, subject, level) for level in levels]))
+    return levels
+
+
+def remove_subject(system, tutor_id, subject, level):
+    system.run_transaction(lambda cursor: cursor.execute('''
+        DELETE FROM tutor_subjects WHERE tutor_id = %s AND subject = %s AND level = %s
+    ''', (tutor_id, subject, level)))
+
+
+# --- Requests ---------------------------------------------------------------
+
+def normalize_request_key(subject, topic, level):
+    """Case- and whitespace-insensitive key shared by equivalent pending requests"""
+    return '|'.join(' '.join(part.split()).lower() for part in (subject, topic, level))
+
+
+def request_dedup_query(dedup_key):
+    """(query, params) reading the pending request with this key"""
+    return '''
+        SELECT request_id, participant_count FROM session_requests WHERE pending_dedup_key = %s
+    ''', (dedup_key,)
+
+
+def create_or_join_request(system, student_id, subject, topic, level, details='', idempotency_key=None):
+    """Creates a pending request or joins the equivalent one, atomically.
+
+    The unique index on pending_dedup_key makes the INSERT ... ON DUPLICATE KEY
+    UPDATE either create the request or bump and lock the existing one, so two
+    students racing on the same topic always end up in the same request. The
+    id is allocated before the transaction; a join leaves it unused.
+    Returns {'request_id', 'created', 'joined', 'participant_count'}.
+    """
+    subject, topic, level = _text(subject, "Subject"), _text(topic, "Topic"), _level(level)
+    dedup_key = normalize_request_key(subject, topic, level)
+    new_id = system.generate_id('request')
+
+    def create_or_join(cursor):
+        cursor.execute('''
+            INSERT INTO session_requests (
+                request_id, student_id, subject, topic, level,
+                details, request_date, status, participant_count, dedup_key
+            ) VALUES (%s, %s, %s, %s, %s, %s, CURDATE(), 'pending', 1, %s)
+            ON DUPLICATE KEY UPDATE participant_count = participant_count + 1
+        ''', (
+            new_id, student_id, ' '.join(subject.split()), ' '.join(topic.split()),
+            level, details or '', dedup_key
+        ))
+        created = cursor.rowcount == 1
+
+        cursor.execute('''
+            INSERT IGNORE INTO request_participations (request_id, student_id)
+            SELECT request_id, %s FROM session_requests WHERE pending_dedup_key = %s
+        ''', (student_id, dedup_key))
+        joined = cursor.rowcount == 1 and not created
+        if cursor.rowcount == 0:
+            # Already taking part: undo the bump on the row the upsert locked
+            cursor.execute('''
+                UPDATE session_requests SET participant_count = participant_count - 1
+                WHERE pending_dedup_key = %s
+            ''', (dedup_key,))
+
+        cursor.execute(*request_dedup_query(dedup_key))
+        request_id, participant_count = cursor.fetchone()
+        return {
+            'request_id': request_id,
+            'created': created,
+            'joined': joined,
+            'participant_count': participant_count,
+        }
+
+    return system.run_transaction(create_or_join, idempotency_key=idempotency_key, idempotent=True)
+
+
+def pending_requests_for_student(system, student_id):
+    """Returns pending requests, newest first, each with is_participant for this student"""
+    with system.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute('''
+                SELECT sr.request_id, sr.subject, sr.topic, sr.level, sr.details,
+                       sr.participant_count,
+                       EXISTS (
+                           SELECT 1 FROM request_participations rp
+                           WHERE rp.request_id = sr.request_id AND rp.student_id = %s
+                       ) AS is_participant
+                FROM session_requests sr
+                WHERE sr.status = 'pending'
+                ORDER BY sr.request_date DESC
+            ''', (student_id,))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def join_request(system, student_id, request_id):
+    """Adds the student to a pending request; returns False if they already take part"""
+    def join(cursor):
+        cursor.execute('''
+            INSERT IGNORE INTO request_participations (request_id, student_id)
+            VALUES (%s, %s)
+        ''', (request_id, student_id))
+        if cursor.rowcount == 0:
+            return False
+        cursor.execute('''
+            UPDATE session_requests SET participant_count = participant_count + 1
+            WHERE request_id = %s AND status = 'pending'
+        ''', (request_id,))
+        if cursor.rowcount == 0:
+            raise NotFound("This request is no longer pending.")
+        return True
+
+    return system.run_transaction(join)
+
+
+def pending_requests_query(limit=None):
+    """(query, params) reading pending requests, most-demanded first, optionally only the top `limit`"""
+    query = f'''
+        SELECT {Request.columns()}
+        FROM session_requests sr
+        WHERE sr.status = 'pending'
+        ORDER BY sr.participant_count DESC, sr.request_date DESC
+    '''
+    params = ()
+    if limit:
+        query += " LIMIT %s"
+        params = (limit,)
+    return query, params
+
+
+def fetch_pending_requests(connection, limit=None):
+    """Returns pending requests, most-demanded first, optionally only the top `limit`.
+
+    Served by idx_requests_status_demand, so a top-N read does not walk the whole backlog.
+    """
+    return fetch_records(connection, Request, *pending_requests_query(limit))
+
+
+def requests_for_tutor(system, tutor_id, limit=None):
+    """Returns (requests, matched): the tutor's ranked shortlist, or the most-demanded
+    requests with matched=False when the tutor has not recorded any subjects"""
+    with system.get_connection() as connection:
+        shortlist = matching.shortlist_for_tutor(connection, tutor_id, limit)
+        if shortlist is not None:
+            return shortlist, True
+        return fetch_pending_requests(connection, limit), False
+
+
+def suggest_times(system, tutor_id, request_id, duration):
+    """Returns the best start times for a request (see slots.suggest_slots)"""
+    with system.get_connection() as connection:
+        return slots.suggest_slots(connection, request_id, tutor_id, _duration(duration))
+
+
+def _create_session_from_request(cursor, session_id, request, fields):
+    """Creates the session for a request, registers its participants and returns how many"""
+    cursor.execute('''
+        INSERT INTO sessions (
+            session_id, tutor_id, subject, topic, level, details,
+            date, start_time, duration, end_time, mode, status,
+            from_request, request_id, location, online_link
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'active', TRUE, %s, %s, %s)
+    ''', (
+        session_id, fields['tutor_id'], request['subject'], request['topic'], request['level'],
+        request['details'], fields['date'], fields['start_time'], fields['duration'],
+        fields['end_time'], fields['mode'], request['request_id'], fields['location'], fields['online_link']
+    ))
+
+    cursor.execute('''
+        UPDATE session_requests SET status = 'fulfilled' WHERE request_id = %s
+    ''', (request['request_id'],))
+
+    # Register all participating students with one set-based statement; the
+    # session is brand new, so none of them can already be registered for it
+    cursor.execute('''
+        INSERT INTO registrations (student_id, session_id, registration_date, status)
+        SELECT student_id, %s, CURDATE(), 'registered'
+        FROM request_participations
+        WHERE request_id = %s
+    ''', (session_id, request['request_id']))
+    inserted = cursor.rowcount
+
+    cursor.execute('''
+        UPDATE sessions SET registration_count = registration_count + %s WHERE session_id = %s
+    ''', (inserted, session_id))
+
+    schedule.add_request_participants(cursor, request['request_id'], session_id)
+
+    return inserted
+
+
+def fulfill_request(system, tutor_id, request_id, date, start_time, duration, mode,
+                    location=None, online_link=None, idempotency_key=None):
+    """Turns a pending request into a session and registers everyone who asked for it.
+
+    Returns {'session_id', 'registered'}. The request row is locked,
+    so two tutors confirming the same request cannot both create a session.
+    """
+    duration = _duration(duration)
+    start_time = _time(start_time)
+    mode, location, online_link = _mode(mode, location, online_link)
+    fields = {
+        'tutor_id': tutor_id, 'date': _date(date), 'start_time': start_time, 'duration': duration,
+        'end_time': end_time(start_time, duration), 'mode': mode,
+        'location': location, 'online_link': online_link,
+    }
+    conflicts = tutor_conflicts(system, tutor_id, fields['date'], start_time, duration)
+    if conflicts:
+        raise TimeConflict("This session overlaps with an existing session.", conflicts)
+
+    session_id = system.generate_id('session')
+
+    def fulfill(cursor):
+        cursor.execute('''
+            SELECT request_id, subject, topic, level, details FROM session_requests
+            WHERE request_id = %s AND status = 'pending'
+            FOR UPDATE
+        ''', (request_id,))
+        request = cursor.fetchone()
+        if request is None:
+            raise NotFound("This request is no longer pending.")
+        registered = _create_session_from_request(cursor, session_id, request, fields)
+        return {'session_id': session_id, 'registered': registered}
+
+    try:
+        result = system.run_transaction(fulfill, dictionary=True, idempotency_key=idempotency_key, idempotent=True)
+    except Error as e:
+        if _slot_taken(e):
+            raise TimeConflict("A session already exists at this date and time.") from e
+        raise
+    system.invalidate_sessions(result['session_id'])
+    return result
+
+
+# --- Catalog and registrations ----------------------------------------------
+
+def _fulltext_terms(text):
+    """Turns free text into a BOOLEAN MODE query requiring every word (prefix match)"""
+    words = [''.join(ch for ch in word if ch.isalnum()) for word in text.split()]
+    return ' '.join(f"+{word}*" for word in words if word)
+
+
+def catalog_query(after=None, page_size=CATALOG_PAGE_SIZE, filters=None):
+    """(query, params) reading one catalog page plus one row to tell whether more follow"""
+    filters = filters or {}
+    query = f'''
+        SELECT {Session.columns()}
+        FROM sessions s
+        JOIN tutors t ON s.tutor_id = t.tutor_id
+        WHERE s.status = 'active' AND s.date >= CURDATE()
+    '''
+    params = []
+    if filters.get('subject'):
+        query += " AND s.subject = %s"
+        params.append(filters['subject'])
+    if filters.get('topic'):
+        query += " AND s.topic LIKE %s"
+        params.append(filters['topic'] + '%')
+    if filters.get('level'):
+        query += " AND s.level = %s"
+        params.append(filters['level'].capitalize())
+    if filters.get('mode'):
+        query += " AND s.mode = %s"
+        params.append(filters['mode'].capitalize())
+    if filters.get('tutor'):
+        query += " AND t.name LIKE %s"
+        params.append(filters['tutor'] + '%')
+    if filters.get('date_from'):
+        query += " AND s.date >= %s"
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        query += " AND s.date <= %s"
+        params.append(filters['date_to'])
+    if filters.get('text') and _fulltext_terms(filters['text']):
+        query += " AND MATCH(s.topic, s.details) AGAINST (%s IN BOOLEAN MODE)"
+        params.append(_fulltext_terms(filters['text']))
+    if after:
+        # Expanded rather than a row constructor, which MySQL may not turn into a range
+        date, start_time, session_id = after
+        query += (" AND (s.date > %s OR (s.date = %s AND (s.start_time > %s"
+                  " OR (s.start_time = %s AND s.session_id > %s))))")
+        params.extend([date, date, start_time, start_time, session_id])
+    query += " ORDER BY s.date, s.start_time, s.session_id LIMIT %s"
+    params.append(page_size + 1)
+    return query, params
+
+
+def fetch_catalog_page(connection, after=None, page_size=CATALOG_PAGE_SIZE, filters=None):
+    """Fetches one page of active upcoming sessions using keyset pagination.
+
+    `after` is the (date, start_time, session_id) key of the last row of the
+    previous page. Returns (rows, has_more). Only page_size + 1 rows are read
+    from an unbuffered (server-side) cursor, so memory stays bounded by the page.
+    `filters` may hold subject, topic, level, mode, tutor, date_from, date_to
+    and text. Subject, level and mode each have an index that returns rows in
+    page order (migration 16); topic and tutor name prefixes are range scans
+    whose matches are sorted, and free text uses the FULLTEXT index.
+    """
+    query, params = catalog_query(after, page_size, filters)
+    rows = fetch_records(connection, Session, query, params, buffered=False)
+    return rows[:page_size], len(rows) > page_size
+
+
+def catalog_page(system, after=None, filters=None, page_size=CATALOG_PAGE_SIZE):
+    """fetch_catalog_page() on a pooled connection"""
+    with system.get_connection() as connection:
+        return fetch_catalog_page(connection, after, page_size, filters)
+
+
+def registered_on_dates_query(student_id, dates):
+    """(query, params) reading the student's registered sessions on the given dates"""
+    return f'''
+        SELECT s.session_id, s.subject, s.date, s.start_time, s.end_time, s.duration
+        FROM registrations r
+        JOIN sessions s ON r.session_id = s.session_id
+        WHERE r.student_id = %s AND r.status = 'registered'
+        AND s.date IN ({', '.join(['%s'] * len(dates))})
+    ''', [student_id] + list(dates)
+
+
+def plan_registrations(system, student_id, sessions):
+    """Classifies each selected session with one query against the student's existing registrations.
+
+    `sessions` are catalog rows. Returns {session_id: (status, conflicts)}
+    where status is 'ok', 'duplicate' or 'conflict'. Overlaps between the
+    selected sessions themselves are reported as conflicts too. Sessions are
+    compared as absolute minute spans, so one that runs past midnight
+    conflicts with the next morning's sessions.
+    """
+    if not sessions:
+        return {}
+    dates = sorted({date for session in sessions for date in neighbour_dates(session['date'])})
+
+    with system.get_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(*registered_on_dates_query(student_id, dates))
+            existing = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    registered_ids = {row['session_id'] for row in existing}
+    calendar = IntervalIndex((*row_span(row), row) for row in existing)
+
+    plan = {}
+    for session in sessions:
+        if session['session_id'] in registered_ids or session['session_id'] in plan:
+            plan.setdefault(session['session_id'], ('duplicate', []))
+            continue
+
+        start, end = row_span(session)
+        conflicts = calendar.overlapping(start, end)
+        plan[session['session_id']] = ('conflict' if conflicts else 'ok', conflicts)
+        # Later selections are checked against this one as well
+        calendar.add(start, end, session)
+
+    return plan
+
+
+def registered_among_query(student_id, session_ids):
+    """(query, params) locking the student's registrations among session_ids"""
+    return f'''
+        SELECT session_id FROM registrations
+        WHERE student_id = %s AND status = 'registered'
+        AND session_id IN ({', '.join(['%s'] * len(session_ids))})
+        FOR UPDATE
+    ''', [student_id] + list(session_ids)
+
+
+def register_for_sessions(system, student_id, session_ids, idempotency_key=None):
+    """Registers the student for several sessions in one transaction.
+
+    Time conflicts are the client's call (see plan_registrations()); this only
+    enforces duplicates and capacity. Returns {session_id: 'registered',
+    'duplicate' or 'full'}.
+    """
+    session_ids = sorted(set(session_ids))
+    if not session_ids:
+        return {}
+
+    def register(cursor):
+        # Re-check duplicates under lock in case another client registered meanwhile
+        cursor.execute(*registered_among_query(student_id, session_ids))
+        results = {row[0]: 'duplicate' for row in cursor.fetchall()}
+
+        # Claim seats first (in session_id order so concurrent batches
+        # lock sessions in the same order); full sessions drop out
+        claimed = []
+        for session_id in session_ids:
+            if session_id in results:
+                continue
+            if seats.claim_seat(cursor, session_id):
+                claimed.append(session_id)
+                results[session_id] = 'registered'
+            else:
+                results[session_id] = 'full'
+
+        seats.add_registrations(cursor, student_id, claimed)
+        return results
+
+    results = system.run_transaction(register, idempotency_key=idempotency_key, idempotent=True)
+    system.invalidate_sessions(*session_ids)
+    return results
+
+
+def join_waitlists(system, student_id, session_ids):
+    """Puts the student on the waitlist of each full session; returns {session_id: position or None}"""
+    return system.run_transaction(lambda cursor: {
+        session_id: seats.join_waitlist(cursor, session_id, student_id)
+        for session_id in sorted(set(session_ids))
+    })
+
+
+def student_registrations_query(student_id):
+    """(query, params) reading the student's upcoming registrations in date order"""
+    return f'''
+        SELECT {Registration.columns()}
+        FROM registrations r
+        JOIN sessions s ON r.session_id = s.session_id
+        JOIN tutors t ON s.tutor_id = t.tutor_id
+        WHERE r.student_id = %s AND r.status = 'registered'
+        AND s.date >= CURDATE()
+        ORDER BY s.date, s.start_time
+    ''', (student_id,)
+
+
+def student_registrations(system, student_id):
+    """Returns the student's upcoming registrations in date order"""
+    with system.get_connection() as connection:
+        return fetch_records(connection, Registration, *student_registrations_query(student_id))
+
+
+def cancel_registrations(system, student_id, cancellations, idempotency_key=None):
+    """Cancels several of the student's registrations in one all-or-nothing transaction.
+
+    `cancellations` is a list of (registration_id, session_id, reason). Raises
+    NotFound (after rolling back) if any registration is no longer active,
+    otherwise returns how many were cancelled. Freed seats go to the waitlist.
+    """
+    if not cancellations:
+        return 0
+    cancellations = [
+        (registration_id, session_id, _text(reason, "Cancellation reason"))
+        for registration_id, session_id, reason in cancellations
+    ]
+    registration_ids = [registration_id for registration_id, _, _ in cancellations]
+    session_ids = list(dict.fromkeys(session_id for _, session_id, _ in cancellations))
+
+    def cancel(cursor):
+        # Update every registration status in one statement
+        cursor.execute(f'''
+            UPDATE registrations
+            SET status = 'cancelled'
+            WHERE registration_id IN ({', '.join(['%s'] * len(registration_ids))})
+            AND student_id = %s AND status = 'registered'
+        ''', registration_ids + [student_id])
+
+        if cursor.rowcount != len(registration_ids):
+            raise NotFound("Some of these sessions were already cancelled. Please refresh and try again.")
+
+        # Release the seats
+        cursor.execute(f'''
+            UPDATE sessions
+            SET registration_count = GREATEST(registration_count - 1, 0)
+            WHERE session_id IN ({', '.join(['%s'] * len(session_ids))})
+        ''', session_ids)
+        schedule.remove_registrations(cursor, student_id, session_ids)
+
+        # Record cancellations (executemany sends one multi-row INSERT)
+        cursor.executemany('''
+            INSERT INTO cancellations (session_id, student_id, reason)
+            VALUES (%s, %s, %s)
+        ''', [(session_id, student_id, reason) for _, session_id, reason in cancellations])
+
+        # Freed seats go straight to the first student on each waitlist
+        seats.promote_from_waitlist(cursor, session_ids)
+
+    system.run_transaction(cancel, idempotency_key=idempotency_key, idempotent=True)
+    system.invalidate_sessions(*session_ids)
+    return len(registration_ids)
+
+
+# --- Schedules and past sessions --------------------------------------------
+
+def student_schedule(system, student_id):
+    """Returns the student's upcoming sessions (see schedule.fetch_schedule)"""
+    with system.get_connection() as connection:
+        return schedule.fetch_schedule(connection, student_id)
+
+
+def past_sessions_for_student(system, student_id):
+    """Returns the student's most recent past sessions, archived ones included"""
+    with system.get_connection() as connection:
+        return archive.fetch_past_sessions_for_student(connection, student_id)
+
+
+def past_sessions_for_tutor(system, tutor_id):
+    """Returns the tutor's most recent past sessions, archived ones included"""
+    with system.get_connection() as connection:
+        return archive.fetch_past_sessions_for_tutor(connection, tutor_id)
@@ -2,6 +2,11 @@ import datetime
 from getpass import getpass
 from mysql.connector import Error
 
+import archive
+import seats
+import services
+from services import ServiceError
+
 """
    Function that allows displays the student dashboard interface
  """
@@ -30,114 +35,191 @@ def student_flow(system):
             break
         else:
             print("Invalid choice. Please enter a number between 1-4.")
-def register_for_session(system, session):
-    
-    """Handles session registration process with time collision check"""
+def _offer_waitlist(system, full_sessions, results):
+    """Offers to put the student on the waitlist of sessions that were full"""
+    print("\n These sessions are full:")
+    for session in full_sessions:
+        print(f"- {session['subject']} on {session['date']} ({session['start_time']}-{session['end_time']})")
+
+    choice = input("\nJoin the waitlist for them? You will be registered automatically when a seat frees up (yes/no): ").lower()
+    while choice not in ['yes', 'no', 'y', 'n']:
+        choice = input("Please enter 'yes' or 'no': ").lower()
+    if choice in ['no', 'n']:
+        return
+
+    positions = services.join_waitlists(
+        system, system.current_user_id, [session['session_id'] for session in full_sessions]
+    )
+
+    for session in full_sessions:
+        position = positions[session['session_id']]
+        if position is None:
+            print(f" Not waitlisted for {session['subject']} on {session['date']}: a seat is free or you already hold one")
+            continue
+        results[session['session_id']] = 'waitlisted'
+        print(f" Waitlisted for {session['subject']} on {session['date']} (position {position})")
+
+def register_for_sessions(system, sessions):
+    """Registers the student for several sessions in one transaction.
+
+    Returns {session_id: result} with result 'registered', 'duplicate', 'conflict'
+    (declined because of a time overlap), 'full', 'waitlisted' or 'failed'.
+    """
+    # Selecting the same session twice only registers it once
+    sessions = list({session['session_id']: session for session in sessions}.values())
+    results = {}
     try:
-        cursor = system.connection.cursor(dictionary=True)
-
-        # Check if already registered
-        cursor.execute('''
-            SELECT 1 FROM registrations 
-            WHERE student_id = %s AND session_id = %s AND status = 'registered'
-        ''', (system.current_user_id, session['session_id']))
-
-        if cursor.fetchone():
-            print("\n You are already registered for this session!")
-            return False
-
-        # Check for time conflicts
-        cursor.execute('''
-            SELECT s.session_id, s.subject, s.start_time, s.end_time
-            FROM registrations r
-            JOIN sessions s ON r.session_id = s.session_id
-            WHERE r.student_id = %s 
-            AND s.date = %s 
-            AND (
-                (s.start_time < %s AND s.end_time > %s) OR
-                (s.start_time >= %s AND s.start_time < %s) OR
-                (s.end_time > %s AND s.end_time <= %s)
-            )
-            AND r.status = 'registered'
-        ''', (
-            system.current_user_id, session['date'],
-            session['end_time'], session['start_time'],
-            session['start_time'], session['end_time'],
-            session['start_time'], session['end_time']
-        ))
-
-        conflicts = cursor.fetchall()
-        if conflicts:
+        plan = services.plan_registrations(system, system.current_user_id, sessions)
+
+        to_register = []
+        conflicting = []
+        for session in sessions:
+            status, conflicts = plan[session['session_id']]
+            results[session['session_id']] = status
+            if status == 'duplicate':
+                print(f"\n You are already registered for {session['subject']} on {session['date']}!")
+            elif status == 'conflict':
+                conflicting.append((session, conflicts))
+            else:
+                to_register.append(session)
+
+        if conflicting:
             print("\n Time conflict with existing sessions:")
-            for conflict in conflicts:
-                print(f"- {conflict['subject']} ({conflict['start_time']}-{conflict['end_time']})")
+            for session, conflicts in conflicting:
+                print(f"{session['subject']} ({session['start_time']}-{session['end_time']}) on {session['date']} overlaps:")
+                for conflict in conflicts:
+                    print(f"- {conflict['subject']} ({conflict['start_time']}-{conflict['end_time']})")
             choice = input("\nRegister anyway? (yes/no): ").lower()
             while choice not in ['yes', 'no', 'y', 'n']:
                 choice = input("Please enter 'yes' or 'no': ").lower()
-            if choice in ['no', 'n']:
-                return False
-
-        # Register for session
-        cursor.execute('''
-            INSERT INTO registrations 
-            (student_id, session_id, registration_date, status)
-            VALUES (%s, %s, %s, %s)
-        ''', (
-            system.current_user_id,
-            session['session_id'],
-            datetime.datetime.now().strftime("%Y-%m-%d"),
-            "registered"
-        ))
-
-        system.connection.commit()
-        print(f"\n Successfully registered for session!")
-        return True
+            if choice in ['yes', 'y']:
+                to_register.extend(session for session, _ in conflicting)
+
+        if not to_register:
+            return results
+
+        # Register for all accepted sessions in one transaction
+        registered = services.register_for_sessions(
+            system, system.current_user_id, [session['session_id'] for session in to_register]
+        )
+        results.update(registered)
+        for session in to_register:
+            if registered[session['session_id']] == 'registered':
+                print(f"\n Successfully registered for {session['subject']} on {session['date']}!")
+
+        full_sessions = [session for session in sessions if results[session['session_id']] == 'full']
+        if full_sessions:
+            _offer_waitlist(system, full_sessions, results)
+        return results
 
     except Error as e:
         print(f"\nRegistration failed: {e}")
-        system.connection.rollback()
-        return False
-    finally:
-        cursor.close()
+        for session in sessions:
+            if results.get(session['session_id']) in (None, 'ok', 'conflict'):
+                results[session['session_id']] = 'failed'
+        return results
+CATALOG_FILTERS = [
+    ('subject', 'Subject'),
+    ('topic', 'Topic'),
+    ('level', 'Level (Beginner/Intermediate/Advanced)'),
+    ('mode', 'Mode (Online/In-person)'),
+    ('tutor', 'Tutor name'),
+    ('date_from', 'From date (YYYY-MM-DD)'),
+    ('date_to', 'To date (YYYY-MM-DD)'),
+    ('text', 'Search words in topic/details'),
+]
+
+def _prompt_catalog_filters(current):
+    """Asks for catalog filters; blank keeps the current value, '-' clears it"""
+    print("\nFilter sessions (leave blank to keep, '-' to clear)")
+    filters = dict(current)
+    for key, prompt in CATALOG_FILTERS:
+        value = input(f"{prompt} [{current.get(key, '')}]: ").strip()
+        if value == '-':
+            filters.pop(key, None)
+        elif value:
+            if key in ('date_from', 'date_to'):
+                try:
+                    datetime.datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    print(f"Invalid date '{value}', ignoring it.")
+                    continue
+            filters[key] = value
+    return filters
+
+def _catalog_key(session):
+    """Keyset position of a catalog row"""
+    return (session['date'], session['start_time'], session['session_id'])
+
 """ Displays all active upcoming sessions to the student"""
 def student_view_and_register_sessions(system):
-    """Show all available sessions with registration option"""
-    try:
-        cursor = system.connection.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT s.session_id, s.subject, s.topic, s.date, 
-                   s.start_time, s.end_time, s.duration, s.mode,
-                   t.name AS tutor_name, t.email AS tutor_email,
-                   s.location, s.online_link, s.details
-            FROM sessions s
-            JOIN tutors t ON s.tutor_id = t.tutor_id
-            WHERE s.status = 'active' AND s.date >= CURDATE()
-            ORDER BY s.date, s.start_time
-        ''')
-
-        sessions = cursor.fetchall()
+    """Browse available sessions page by page with registration option"""
+    # page_keys[i] is the key the i-th page starts after (None for the first page)
+    page_keys = [None]
+    filters = {}
 
-        if not sessions:
-            print("\nNo available sessions at this time.")
-            input("\nPress Enter to return to dashboard...")
-            return
+    try:
+        while True:
+            sessions, has_more = services.catalog_page(system, page_keys[-1], filters)
 
-        print("\n Available Sessions:")
-        for idx, session in enumerate(sessions, 1):
-            print(f"\n{idx}. Subject: {session['subject']} - {session['topic']}")
-            print(f"   Date: {session['date']} | Time: {session['start_time']}-{session['end_time']}")
-            print(f"   Duration: {session['duration']} min | Mode: {session['mode']}")
-            print(f"   Tutor: {session['tutor_name']} ({session['tutor_email']})")
-            if session['mode'] == 'Online':
-                print(f"   Link: {session['online_link']}")
-            else:
-                print(f"   Location: {session['location']}")
-            print(f"   Details: {session['details'] or 'No details available'}")
+            if not sessions and len(page_keys) == 1 and not filters:
+                print("\nNo available sessions at this time.")
+                input("\nPress Enter to return to dashboard...")
+                return
 
-        while True:
-            selection = input("\nEnter session numbers to register (comma separated, 0 to cancel): ").strip()
+            first_number = (len(page_keys) - 1) * services.CATALOG_PAGE_SIZE + 1
+            last_number = first_number + len(sessions) - 1
+
+            print(f"\n Available Sessions (page {len(page_keys)}):")
+            if filters:
+                print("   Filters: " + ', '.join(f"{key}={value}" for key, value in filters.items()))
+            if not sessions:
+                print("\nNo sessions match these filters.")
+            for idx, session in enumerate(sessions, first_number):
+                print(f"\n{idx}. Subject: {session['subject']} - {session['topic']}")
+                print(f"   Date: {session['date']} | Time: {session['start_time']}-{session['end_time']}")
+                print(f"   Duration: {session['duration']} min | Mode: {session['mode']}")
+                print(f"   Tutor: {session['tutor_name']} ({session['tutor_email']})")
+                if session['mode'] == 'Online':
+                    print(f"   Link: {session['online_link']}")
+                else:
+                    print(f"   Location: {session['location']}")
+                print(f"   Details: {session['details'] or 'No details available'}")
+                left = seats.seats_left(session)
+                if left == 0:
+                    print("   Seats: FULL (you can join the waitlist)")
+                elif left is not None:
+                    print(f"   Seats left: {left} of {session['capacity']}")
+
+            options = []
+            if has_more:
+                options.append("'n' next page")
+            if len(page_keys) > 1:
+                options.append("'p' previous page")
+            options.append("'f' filter/search")
+            options.append("0 to cancel")
+
+            selection = input(
+                f"\nEnter session numbers to register (comma separated, {', '.join(options)}): "
+            ).strip().lower()
             if selection == '0':
                 break
+            if selection == 'n':
+                if has_more:
+                    page_keys.append(_catalog_key(sessions[-1]))
+                else:
+                    print("You are on the last page.")
+                continue
+            if selection == 'f':
+                filters = _prompt_catalog_filters(filters)
+                page_keys = [None]
+                continue
+            if selection == 'p':
+                if len(page_keys) > 1:
+                    page_keys.pop()
+                else:
+                    print("You are on the first page.")
+                continue
 
             selected_indices = []
             for s in selection.split(','):
@@ -145,19 +227,17 @@ def student_view_and_register_sessions(system):
                 if not s.isdigit():
                     print(f"Invalid input '{s}'. Please enter numbers only.")
                     continue
-                idx = int(s) - 1
-                if 0 <= idx < len(sessions):
-                    selected_indices.append(idx)
+                number = int(s)
+                if first_number <= number <= last_number:
+                    selected_indices.append(number - first_number)
                 else:
-                    print(f"Invalid session number {s}. Please enter numbers between 1-{len(sessions)}")
+                    print(f"Invalid session number {s}. Please enter numbers between {first_number}-{last_number}")
 
             if not selected_indices:
                 continue
 
-            registered_count = 0
-            for idx in selected_indices:
-                if register_for_session(system, sessions[idx]):
-                    registered_count += 1
+            results = register_for_sessions(system, [sessions[idx] for idx in selected_indices])
+            registered_count = sum(1 for result in results.values() if result == 'registered')
 
             if registered_count > 0:
                 print(f"\n Successfully registered for {registered_count} session(s)")
@@ -170,8 +250,6 @@ def student_view_and_register_sessions(system):
     except Error as e:
         print(f"\nError viewing sessions: {e}")
         input("\nPress Enter to continue...")
-    finally:
-        cursor.close()
 
 """Displays a menu for students to manage their session requests."""
 def student_requests_menu(system):
@@ -199,36 +277,27 @@ def student_requests_menu(system):
         print("\n My Scheduled Sessions")
         print("1. View all scheduled sessions")
         print("2. Cancel one or more sessions")
-        print("3. Back to Dashboard")
+        print("3. View past sessions")
+        print("4. Back to Dashboard")
 
-        choice = input("Enter your choice (1-3): ").strip()
+        choice = input("Enter your choice (1-4): ").strip()
 
         if choice == '1':
             student_view_scheduled(system)
         elif choice == '2':
             student_cancel_session(system)
         elif choice == '3':
+            student_view_past_sessions(system)
+        elif choice == '4':
             break
         else:
-            print("Invalid choice. Please enter 1-3.")
+            print("Invalid choice. Please enter 1-4.")
 
 """Confirm student request"""
 def student_view_and_confirm_requests(system):
     """View and confirm interest in pending requests"""
     try:
-        cursor = system.connection.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT sr.request_id, sr.subject, sr.topic, sr.level, sr.details,
-                   COUNT(rp.student_id) AS participant_count,
-                   MAX(CASE WHEN rp.student_id = %s THEN 1 ELSE 0 END) AS is_participant
-            FROM session_requests sr
-            LEFT JOIN request_participations rp ON sr.request_id = rp.request_id
-            WHERE sr.status = 'pending'
-            GROUP BY sr.request_id, sr.subject, sr.topic, sr.level, sr.details
-            ORDER BY sr.request_date DESC
-        ''', (system.current_user_id,))
-
-        pending_requests = cursor.fetchall()
+        pending_requests = services.pending_requests_for_student(system, system.current_user_id)
 
         if not pending_requests:
             print("\nNo pending session requests at this time.")
@@ -251,148 +320,52 @@ def student_view_and_confirm_requests(system):
 
                 if confirm in ['yes', 'y']:
                     try:
-                        cursor.execute('''
-                            INSERT INTO request_participations (request_id, student_id)
-                            VALUES (%s, %s)
-                        ''', (req['request_id'], system.current_user_id))
-                        system.connection.commit()
-                        print(" Thank you for confirming your interest!")
-                    except Error as e:
-                        if "PRIMARY" in str(e):
-                            print("You've already participated in this request.")
+                        if services.join_request(system, system.current_user_id, req['request_id']):
+                            print(" Thank you for confirming your interest!")
                         else:
-                            print(f"Error confirming participation: {e}")
-                            system.connection.rollback()
+                            print("You've already participated in this request.")
+                    except ServiceError as e:
+                        print(e)
+                    except Error as e:
+                        print(f"Error confirming participation: {e}")
 
     except Error as e:
         print(f"\nError viewing requests: {e}")
-    finally:
-        cursor.close()
 
 """User new request"""
 def _create_new_request(system):
     """Helper method to create a new session request"""
     print("\nRequest a New Session Topic")
-    request_data = {
-        "student_id": system.current_user_id,
-        "subject": system.get_valid_input_generic("Subject: ", lambda x: len(x) > 0),
-        "topic": system.get_valid_input_generic("Topic: ", lambda x: len(x) > 0),
-        "level": system.get_valid_input_generic(
-            "Level (Beginner/Intermediate/Advanced): ",
-            lambda x: x.lower() in ['beginner', 'intermediate', 'advanced'],
-            "Please enter Beginner, Intermediate, or Advanced"
-        ).capitalize(),
-        "details": input("Additional details about what you want to learn: "),
-        "request_date": datetime.datetime.now().strftime("%Y-%m-%d"),
-        "status": "pending"
-    }
+    subject = system.get_valid_input_generic("Subject: ", lambda x: len(x) > 0)
+    topic = system.get_valid_input_generic("Topic: ", lambda x: len(x) > 0)
+    level = system.get_valid_input_generic(
+        "Level (Beginner/Intermediate/Advanced): ",
+        lambda x: x.lower() in ['beginner', 'intermediate', 'advanced'],
+        "Please enter Beginner, Intermediate, or Advanced"
+    )
+    details = input("Additional details about what you want to learn: ")
 
     try:
-        cursor = system.connection.cursor(dictionary=True)
-
-        # Check for existing similar request
-        cursor.execute('''
-            SELECT sr.request_id
-            FROM session_requests sr
-            WHERE sr.subject = %s AND sr.topic = %s AND sr.level = %s 
-            AND sr.status = 'pending'
-            LIMIT 1
-        ''', (
-            request_data['subject'], request_data['topic'],
-            request_data['level']
-        ))
-
-        existing_request = cursor.fetchone()
-
-        if existing_request:
-            # Add participation to existing request
-            try:
-                cursor.execute('''
-                    INSERT INTO request_participations (request_id, student_id)
-                    VALUES (%s, %s)
-                ''', (existing_request['request_id'], system.current_user_id))
-
-                system.connection.commit()
-                print("\n Similar request found! Added your interest to the existing request.")
-
-                # Get participant count
-                cursor.execute('''
-                    SELECT COUNT(*) AS count
-                    FROM request_participations
-                    WHERE request_id = %s
-                ''', (existing_request['request_id'],))
-                count = cursor.fetchone()['count']
-                print(f"Now {count} students are interested in this topic.")
-
-            except Error as e:
-                if "PRIMARY" in str(e):
-                    print("You've already participated in this request.")
-                else:
-                    raise
-        else:
-            # Create new request
-            request_id = system.generate_id('request')
-            cursor.execute('''
-                INSERT INTO session_requests (
-                    request_id, student_id, subject, topic, level, 
-                    details, request_date, status
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                request_id, request_data['student_id'], request_data['subject'],
-                request_data['topic'], request_data['level'], request_data['details'],
-                request_data['request_date'], request_data['status']
-            ))
-
-            # Add participation
-            cursor.execute('''
-                INSERT INTO request_participations (request_id, student_id)
-                VALUES (%s, %s)
-            ''', (request_id, system.current_user_id))
-
-            system.connection.commit()
+        result = services.create_or_join_request(system, system.current_user_id, subject, topic, level, details)
+
+        if result['created']:
             print("\n Your session request has been submitted! Tutors will be notified.")
+        elif result['joined']:
+            print("\n Similar request found! Added your interest to the existing request.")
+            print(f"Now {result['participant_count']} students are interested in this topic.")
+        else:
+            print("You've already participated in this request.")
 
+    except ServiceError as e:
+        print(f"\n{e}")
     except Error as e:
         print(f"\nError processing request: {e}")
-        system.connection.rollback()
-    finally:
-        cursor.close()
-               
+
 """Student schedule view"""        
 def student_view_scheduled(system):
     """Student views their scheduled sessions with tutor email"""
     try:
-        cursor = system.connection.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT s.session_id, s.subject, s.topic, s.level, s.date, 
-                   s.start_time, s.end_time, s.duration, s.mode, s.details, 
-                   r.registration_date, t.name AS tutor_name, t.email AS tutor_email,
-                   NULL AS request_id, NULL AS request_date, r.registration_id,
-                   s.location, s.online_link
-            FROM registrations r
-            JOIN sessions s ON r.session_id = s.session_id
-            JOIN tutors t ON s.tutor_id = t.tutor_id
-            WHERE r.student_id = %s AND r.status = 'registered'
-            AND s.status = 'active' AND s.date >= CURDATE()
-
-            UNION
-
-            SELECT s.session_id, s.subject, s.topic, s.level, s.date, 
-                   s.start_time, s.end_time, s.duration, s.mode, s.details,
-                   NULL AS registration_date, t.name AS tutor_name, t.email AS tutor_email,
-                   sr.request_id, sr.request_date, NULL AS registration_id,
-                   s.location, s.online_link
-            FROM request_participations rp
-            JOIN session_requests sr ON rp.request_id = sr.request_id
-            JOIN sessions s ON sr.request_id = s.request_id
-            JOIN tutors t ON s.tutor_id = t.tutor_id
-            WHERE rp.student_id = %s AND sr.status = 'fulfilled'
-            AND s.status = 'active' AND s.date >= CURDATE()
-
-            ORDER BY date, start_time
-        ''', (system.current_user_id, system.current_user_id))
-
-        scheduled_sessions = cursor.fetchall()
+        scheduled_sessions = services.student_schedule(system, system.current_user_id)
 
         if not scheduled_sessions:
             print("\nYou have no scheduled sessions.")
@@ -423,27 +396,29 @@ def student_view_scheduled(system):
 
     except Error as e:
         print(f"\nError viewing scheduled sessions: {e}")
-    finally:
-        cursor.close()
+
+"""Student past sessions view"""
+def student_view_past_sessions(system):
+    """Student views their most recent past sessions, including archived ones"""
+    try:
+        sessions = services.past_sessions_for_student(system, system.current_user_id)
+
+        if not sessions:
+            print("\nYou have no past sessions.")
+            return
+
+        print(f"\n Your Past Sessions (latest {len(sessions)}):")
+        for session in sessions:
+            archive.print_past_session(session)
+
+    except Error as e:
+        print(f"\nError viewing past sessions: {e}")
 
 """Student cancel session"""
 def student_cancel_session(system):
     """Allows student to cancel registered sessions with validation"""
     try:
-        cursor = system.connection.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT s.session_id, s.subject, s.topic, s.date, s.start_time, s.end_time,
-                   s.mode, t.name AS tutor_name, t.email AS tutor_email,
-                   s.location, s.online_link, r.registration_id
-            FROM registrations r
-            JOIN sessions s ON r.session_id = s.session_id
-            JOIN tutors t ON s.tutor_id = t.tutor_id
-            WHERE r.student_id = %s AND r.status = 'registered'
-            AND s.date >= CURDATE()
-            ORDER BY s.date, s.start_time
-        ''', (system.current_user_id,))
-
-        sessions = cursor.fetchall()
+        sessions = services.student_registrations(system, system.current_user_id)
 
         if not sessions:
             print("\nYou have no sessions to cancel.")
@@ -460,6 +435,7 @@ def student_cancel_session(system):
             else:
                 print(f"   Location: {session['location']}")
 
+        cancelled_ids = set()
         while True:
             session_input = input(
                 "\nEnter session numbers to cancel (comma separated, or 'cancel' to go back): ").strip()
@@ -486,9 +462,13 @@ def student_cancel_session(system):
             if not valid_input or not selected_indices:
                 continue
 
-            cancelled_count = 0
-            for idx in selected_indices:
+            # Collect every reason and confirmation before touching the database
+            to_cancel = []
+            for idx in dict.fromkeys(selected_indices):
                 session = sessions[idx]
+                if session['registration_id'] in cancelled_ids:
+                    print(f"Session {idx + 1} is already cancelled.")
+                    continue
 
                 reason = input(f"\nReason for cancelling {session['subject']} session: ").strip()
                 while not reason:
@@ -502,29 +482,19 @@ def student_cancel_session(system):
                     print(f"Skipping cancellation for session {idx + 1}")
                     continue
 
-                try:
-                    cursor.execute("START TRANSACTION")
-
-                    # Update registration status
-                    cursor.execute('''
-                        UPDATE registrations
-                        SET status = 'cancelled'
-                        WHERE registration_id = %s
-                    ''', (session['registration_id'],))
+                to_cancel.append((session, reason))
 
-                    # Record cancellation
-                    cursor.execute('''
-                        INSERT INTO cancellations (session_id, student_id, reason)
-                        VALUES (%s, %s, %s)
-                    ''', (session['session_id'], system.current_user_id, reason))
-
-                    system.connection.commit()
-                    cancelled_count += 1
-                    print(f" Cancelled: {session['subject']} on {session['date']}")
-
-                except Error as e:
-                    system.connection.rollback()
-                    print(f"Error cancelling session: {e}")
+            cancelled_count = 0
+            if to_cancel:
+                try:
+                    cancelled_count = services.cancel_registrations(system, system.current_user_id, [
+                        (session['registration_id'], session['session_id'], reason) for session, reason in to_cancel
+                    ])
+                    for session, _ in to_cancel:
+                        cancelled_ids.add(session['registration_id'])
+                        print(f" Cancelled: {session['subject']} on {session['date']}")
+                except (ServiceError, Error) as e:
+                    print(f"Error cancelling sessions, nothing was cancelled: {e}")
 
             if cancelled_count > 0:
                 print(f"\nSuccessfully cancelled {cancelled_count} session(s)")
@@ -536,8 +506,6 @@ def student_cancel_session(system):
 
     except Error as e:
         print(f"\nError processing cancellation: {e}")
-    finally:
-        cursor.close()
 
 """Student Schedule Menu"""
 def student_schedule_menu(system):
@@ -546,15 +514,18 @@ def student_schedule_menu(system):
         print("\n My Scheduled Sessions")
         print("1. View all scheduled sessions")
         print("2. Cancel one or more sessions")
-        print("3. Back to Dashboard")
+        print("3. View past sessions")
+        print("4. Back to Dashboard")
 
-        choice = input("Enter your choice (1-3): ").strip()
+        choice = input("Enter your choice (1-4): ").strip()
 
         if choice == '1':
             student_view_scheduled(system)
         elif choice == '2':
             student_cancel_session(system)
         elif choice == '3':
+            student_view_past_sessions(system)
+        elif choice == '4':
             break
         else:
-            print("Invalid choice. Please enter 1-3.")
\ No newline at end of file
+            print("Invalid choice. Please enter 1-4.")
\ No newline at end of file
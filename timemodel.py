@@ -0,0 +1,98 @@
+"""
+   Integer-minute time model.
+
+   A session is the half-open span [start, end) of absolute minutes, where
+   absolute minute = epoch day * 1440 + minutes since midnight. Epoch days
+   follow MySQL's TO_DAYS() numbering. A session that starts at 23:00 and
+   lasts two hours is simply [d*1440 + 1380, d*1440 + 1500): it ends at
+   01:00 on the next day and overlaps sessions on either date. Overlap
+   tests are then two integer comparisons, with no strptime or timedelta
+   arithmetic. Sessions are assumed to last at most one day (MAX_DURATION).
+"""
+import datetime
+
+MINUTES_PER_DAY = 24 * 60
+MAX_DURATION = MINUTES_PER_DAY
+
+# date.toordinal() counts 0001-01-01 as day 1, TO_DAYS() counts it as day 366
+_TO_DAYS_OFFSET = 365
+
+
+def to_minutes(value):
+    """Converts 'HH:MM', 'HH:MM:SS', datetime.time or timedelta to minutes since midnight"""
+    if isinstance(value, str):
+        parts = value.strip().split(':')
+        return int(parts[0]) * 60 + int(parts[1])
+    if isinstance(value, datetime.time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, datetime.timedelta):
+        # mysql-connector returns TIME columns as timedelta
+        return int(value.total_seconds()) // 60
+    raise ValueError(f"Unsupported time value {value!r}")
+
+
+def format_minutes(minutes):
+    """Formats minutes (absolute or since midnight) as the wall-clock 'HH:MM'"""
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def to_date(value):
+    """Accepts a date or 'YYYY-MM-DD'"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def epoch_day(date):
+    """Day number of a date, equal to MySQL TO_DAYS(date)"""
+    return to_date(date).toordinal() + _TO_DAYS_OFFSET
+
+
+def from_epoch_day(day):
+    """Inverse of epoch_day()"""
+    return datetime.date.fromordinal(day - _TO_DAYS_OFFSET)
+
+
+def session_span(date, start_time, duration):
+    """Returns the session's [start, end) in absolute minutes"""
+    start = epoch_day(date) * MINUTES_PER_DAY + to_minutes(start_time)
+    return start, start + int(duration)
+
+
+def row_span(row):
+    """session_span() of a row carrying date, start_time and duration"""
+    return session_span(row['date'], row['start_time'], row['duration'])
+
+
+def end_time(start_time, duration):
+    """Wall-clock end of a session, wrapping past midnight"""
+    return format_minutes(to_minutes(start_time) + int(duration))
+
+
+def crosses_midnight(start_time, duration):
+    """True when the session ends on the following day"""
+    return to_minutes(start_time) + int(duration) > MINUTES_PER_DAY
+
+
+def neighbour_dates(date, start_time=None, duration=None):
+    """Dates whose sessions can overlap a session on `date`: the day before, the day itself,
+    and the day after when the session runs past midnight (or when its time is unknown)"""
+    date = to_date(date)
+    dates = [date - datetime.timedelta(days=1), date]
+    if start_time is None or crosses_midnight(start_time, duration):
+        dates.append(date + datetime.timedelta(days=1))
+    return dates
+
+
+def day_pieces(start, end):
+    """Splits an absolute span into (date, start minute, end minute) pieces, one per calendar day"""
+    pieces = []
+    while start < end:
+        day = start // MINUTES_PER_DAY
+        day_end = min(end, (day + 1) * MINUTES_PER_DAY)
+        pieces.append((from_epoch_day(day), start - day * MINUTES_PER_DAY, day_end - day * MINUTES_PER_DAY))
+        start = day_end
+    return pieces
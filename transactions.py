@@ -0,0 +1,157 @@
+"""
+   Transaction helper shared by every write path.
+
+   TransactionRunner.run() executes `work(cursor)` inside START TRANSACTION /
+   COMMIT on a pooled connection. Deadlocks (1213) and lock-wait timeouts
+   (1205) roll the attempt back and run it again after a bounded, jittered
+   exponential backoff. `work` must therefore only touch the database and
+   return its result: no input()/print() and no side effects outside the
+   transaction.
+
+   With an idempotency key the first statement of the attempt records the key
+   in idempotency_keys. If the key is already there (a COMMIT that succeeded
+   although the client saw the connection drop, or a front-end resubmitting a
+   request), the stored result is returned and `work` is not run again. Lost
+   connections are only retried under such a key.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from mysql.connector import Error, errorcode
+
+# Errors after which InnoDB has rolled the transaction back and it can safely run again
+RETRYABLE_ERRORS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+
+# The COMMIT may or may not have happened; only safe to retry behind an idempotency key
+CONNECTION_ERRORS = {errorcode.CR_SERVER_LOST, errorcode.CR_SERVER_GONE_ERROR}
+
+IDEMPOTENCY_TTL_DAYS = 2
+
+
+@contextmanager
+def transaction(connection, dictionary=False):
+    """One transaction attempt: yields a cursor, commits on success and rolls back on any error"""
+    cursor = connection.cursor(dictionary=dictionary)
+    try:
+        cursor.execute("START TRANSACTION")
+        yield cursor
+        connection.commit()
+    except BaseException:
+        try:
+            connection.rollback()
+        except Error:
+            pass  # the connection is gone; the pool discards it on release
+        raise
+    finally:
+        cursor.close()
+
+
+def _claim_idempotency_key(cursor, key):
+    """Records the key; returns (True, None) for a new key or (False, stored result) for a replay"""
+    cursor.execute("INSERT IGNORE INTO idempotency_keys (idem_key) VALUES (%s)", (key,))
+    if cursor.rowcount == 1:
+        return True, None
+    cursor.execute("SELECT result FROM idempotency_keys WHERE idem_key = %s", (key,))
+    row = cursor.fetchone()
+    stored = row['result'] if isinstance(row, dict) else row[0]
+    return False, json.loads(stored) if stored is not None else None
+
+
+def _store_idempotent_result(cursor, key, result):
+    """Saves the result next to the key so a replay can return it"""
+    try:
+        payload = json.dumps(result, default=str)
+    except (TypeError, ValueError):
+        return
+    cursor.execute("UPDATE idempotency_keys SET result = %s WHERE idem_key = %s", (payload, key))
+
+
+def prune_idempotency_keys(connection, days=IDEMPOTENCY_TTL_DAYS, batch_size=1000):
+    """Deletes idempotency keys older than `days` in short batches; returns rows removed"""
+    removed = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute('''
+                DELETE FROM idempotency_keys
+                WHERE created_at < NOW() - INTERVAL %s DAY
+                LIMIT %s
+            ''', (days, batch_size))
+            connection.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+    finally:
+        cursor.close()
+    return removed
+
+
+class TransactionRunner:
+    """Runs units of work in transactions with bounded retry and keeps retry/abort counters"""
+
+    def __init__(self, connect, max_attempts=4, base_delay=0.05, max_delay=1.0):
+        self.connect = connect              # context manager factory yielding a connection
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._counters = {'committed': 0, 'retries': 0, 'aborted': 0, 'failed': 0, 'replayed': 0}
+        self._retries_by_errno = {}
+
+    def _count(self, name, errno=None):
+        with self._lock:
+            self._counters[name] += 1
+            if errno is not None:
+                self._retries_by_errno[errno] = self._retries_by_errno.get(errno, 0) + 1
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given (1-based) failed attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def run(self, work, dictionary=False, idempotency_key=None, idempotent=False):
+        """Runs work(cursor) in a transaction and returns its result, retrying retryable errors.
+
+        Pass idempotent=True to guard this call with a fresh key, or an explicit
+        idempotency_key to deduplicate across calls and processes.
+        """
+        if idempotent and idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
+        retryable = RETRYABLE_ERRORS | (CONNECTION_ERRORS if idempotency_key else set())
+
+        attempt = 1
+        while True:
+            try:
+                with self.connect() as connection:
+                    with transaction(connection, dictionary) as cursor:
+                        if idempotency_key:
+                            fresh, stored = _claim_idempotency_key(cursor, idempotency_key)
+                            if not fresh:
+                                self._count('replayed')
+                                return stored
+                        result = work(cursor)
+                        if idempotency_key:
+                            _store_idempotent_result(cursor, idempotency_key, result)
+                self._count('committed')
+                return result
+
+            except Error as e:
+                if e.errno not in retryable:
+                    self._count('failed')
+                    raise
+                if attempt >= self.max_attempts:
+                    self._count('aborted')
+                    raise
+                self._count('retries', e.errno)
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+
+    def stats(self):
+        """Returns committed/retried/aborted counters and retries per MySQL error code"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['retries_by_errno'] = dict(self._retries_by_errno)
+            return stats
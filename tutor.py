@@ -1,21 +1,32 @@
 import datetime
 from mysql.connector import Error
 
+import archive
+import series
+import services
+import slots
+from conflicts import print_conflict
+from services import ServiceError, TimeConflict
+from timemodel import MAX_DURATION, format_minutes, to_minutes
+
 def tutor_flow(system):
     """Simplified tutor main dashboard"""
     while True:
         print(f"\nTutor Dashboard - Welcome {system.current_user_name}!")
         print("1. Manage Sessions")
         print("2. View Scheduled Sessions")
-        print("3. Logout")
+        print("3. View Past Sessions")
+        print("4. Logout")
 
-        choice = input("Enter your choice (1-3): ")
+        choice = input("Enter your choice (1-4): ")
 
         if choice == '1':
             tutor_manage_sessions(system)
         elif choice == '2':
             tutor_view_scheduled_simple(system)
         elif choice == '3':
+            tutor_view_past_sessions(system)
+        elif choice == '4':
             print("Logging out...")
             system.current_user_id = None
             system.current_user_role = None
@@ -29,13 +40,12 @@ def tutor_post_session(system):
     print("\nPost a New Tutoring Session")
 
     session_data = {
-        "tutor_id": system.current_user_id,
         "subject": system.get_valid_input_generic("Subject: ", lambda x: len(x) > 0),
         "topic": system.get_valid_input_generic("Topic: ", lambda x: len(x) > 0),
         "level": system.get_valid_input_generic(
             "Level (Beginner/Intermediate/Advanced): ",
             lambda x: x.lower() in ['beginner', 'intermediate', 'advanced']
-        ).capitalize(),
+        ),
         "details": input("Details: "),
         "date": system.get_valid_input_generic(
             "Date (YYYY-MM-DD): ",
@@ -52,35 +62,18 @@ def tutor_post_session(system):
         )
         session_data['duration'] = int(system.get_valid_input_generic(
             "Duration (minutes): ", 
-            lambda x: x.isdigit() and int(x) > 0
+            lambda x: x.isdigit() and 0 < int(x) <= MAX_DURATION
         ))
-        session_data['end_time'] = system.calculate_end_time(session_data['start_time'], session_data['duration'])
 
         # Check for time conflicts
         try:
-            cursor = system.connection.cursor(dictionary=True)
-            cursor.execute('''
-                SELECT session_id, subject, start_time, end_time 
-                FROM sessions 
-                WHERE tutor_id = %s AND date = %s AND status = 'active'
-            ''', (system.current_user_id, session_data['date']))
-
-            conflict_found = False
-            for existing in cursor.fetchall():
-                existing_start = datetime.datetime.strptime(str(existing['start_time']), "%H:%M:%S").time()
-                existing_end = datetime.datetime.strptime(str(existing['end_time']), "%H:%M:%S").time()
-                new_start = datetime.datetime.strptime(session_data['start_time'], "%H:%M").time()
-                new_end = datetime.datetime.strptime(session_data['end_time'], "%H:%M").time()
-
-                if (new_start < existing_end and new_end > existing_start):
-                    print(f"\n⏰ Time conflict with existing session:")
-                    print(f"Session ID: {existing['session_id']}")
-                    print(f"Subject: {existing['subject']}")
-                    print(f"Time: {existing['start_time']}-{existing['end_time']}")
-                    conflict_found = True
-                    break
-
-            if conflict_found:
+            conflicts = services.tutor_conflicts(
+                system, system.current_user_id, session_data['date'],
+                session_data['start_time'], session_data['duration']
+            )
+
+            if conflicts:
+                print_conflict(conflicts[0])
                 print("\nThis session overlaps with an existing session.")
                 choice = input(
                     "Would you like to: \n1. Enter a new time\n2. Cancel this session\nEnter choice (1/2): ")
@@ -95,69 +88,226 @@ def tutor_post_session(system):
         except Error as e:
             print(f"Error checking for time conflicts: {e}")
             return
-        finally:
-            cursor.close()
 
     # Get remaining details after time is confirmed
     session_data['mode'] = system.get_valid_input_generic(
         "Mode (Online/In-person): ", 
         lambda x: x.lower() in ['online', 'in-person']
-    ).capitalize()
+    )
 
     # Add location/link based on mode
-    if session_data['mode'] == 'In-person':
+    if session_data['mode'].lower() == 'in-person':
         session_data['location'] = system.get_valid_input_generic("Location: ", lambda x: len(x) > 0)
-        session_data['online_link'] = None
     else:
         session_data['online_link'] = system.get_valid_input_generic("Online meeting link: ", lambda x: len(x) > 0)
-        session_data['location'] = None
+
+    session_data['capacity'] = system.get_valid_input_generic(
+        "Maximum students (leave blank for no limit): ",
+        lambda x: x == '' or (x.isdigit() and int(x) > 0)
+    )
 
     # Post the session
     try:
-        cursor = system.connection.cursor()
-        session_id = system.generate_id('session')
-
-        cursor.execute('''
-            INSERT INTO sessions (
-                session_id, tutor_id, subject, topic, level, details, 
-                date, start_time, duration, end_time, mode, status, 
-                location, online_link) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (
-            session_id, session_data['tutor_id'], session_data['subject'], 
-            session_data['topic'], session_data['level'], session_data['details'], 
-            session_data['date'], session_data['start_time'], session_data['duration'], 
-            session_data['end_time'], session_data['mode'], 'active', 
-            session_data['location'], session_data['online_link']
-        ))
-
-        system.connection.commit()
+        session_id = services.post_session(system, system.current_user_id, **session_data)
         print(f"\nSession posted successfully! Session ID: {session_id}")
 
+    except TimeConflict as e:
+        if e.conflicts:
+            print_conflict(e.conflicts[0])
+        print(f"\n{e} Session posting cancelled.")
+    except ServiceError as e:
+        print(f"\n{e}")
     except Error as e:
         print(f"\nError posting session: {e}")
-        system.connection.rollback()
-    finally:
-        cursor.close()
+
+def tutor_post_series(system):
+    """Post a weekly (or every-N-days) series of sessions in one go"""
+    print("\nPost a Recurring Session Series")
+
+    session_data = {
+        "subject": system.get_valid_input_generic("Subject: ", lambda x: len(x) > 0),
+        "topic": system.get_valid_input_generic("Topic: ", lambda x: len(x) > 0),
+        "level": system.get_valid_input_generic(
+            "Level (Beginner/Intermediate/Advanced): ",
+            lambda x: x.lower() in ['beginner', 'intermediate', 'advanced']
+        ),
+        "details": input("Details: "),
+    }
+    first_date = datetime.datetime.strptime(system.get_valid_input_generic(
+        "First date (YYYY-MM-DD): ",
+        lambda x: len(x) == 10 and x[4] == '-' and x[7] == '-' and
+                  datetime.datetime.strptime(x, "%Y-%m-%d") >= datetime.datetime.now()
+    ), "%Y-%m-%d").date()
+    session_data['start_time'] = system.get_valid_input_generic(
+        "Start Time (HH:MM): ", lambda x: len(x) == 5 and x[2] == ':'
+    )
+    session_data['duration'] = int(system.get_valid_input_generic(
+        "Duration (minutes): ", lambda x: x.isdigit() and 0 < int(x) <= MAX_DURATION
+    ))
+
+    every = system.get_valid_input_generic(
+        "Repeat every how many days? (blank for weekly): ",
+        lambda x: x == '' or (x.isdigit() and int(x) > 0)
+    )
+    every_days = int(every) if every else 7
+    end = system.get_valid_input_generic(
+        f"End date (YYYY-MM-DD) or number of sessions (max {series.MAX_OCCURRENCES}): ",
+        lambda x: (x.isdigit() and int(x) > 0) or (len(x) == 10 and x[4] == '-' and x[7] == '-')
+    )
+    if end.isdigit():
+        dates = services.series_dates(first_date, every_days, count=int(end))
+    else:
+        dates = services.series_dates(first_date, every_days, until=datetime.datetime.strptime(end, "%Y-%m-%d").date())
+    if not dates:
+        print("The end date is before the first date. Series cancelled.")
+        return
+
+    # Check every occurrence against the tutor's calendar in one query
+    try:
+        conflicts = services.series_conflicts(
+            system, system.current_user_id, dates, session_data['start_time'], session_data['duration']
+        )
+    except Error as e:
+        print(f"Error checking for time conflicts: {e}")
+        return
+
+    if conflicts:
+        print(f"\n⏰ {len(conflicts)} of {len(dates)} dates overlap existing sessions:")
+        for date, existing in sorted(conflicts.items()):
+            for row in existing:
+                print(f"- {date}: {row['subject']} ({row['start_time']}-{row['end_time']})")
+        choice = input("Skip those dates and post the rest? (yes/no): ").lower()
+        if choice not in ['yes', 'y']:
+            print("Series posting cancelled.")
+            return
+        dates = [date for date in dates if date not in conflicts]
+        if not dates:
+            print("No dates left to post.")
+            return
+
+    session_data['mode'] = system.get_valid_input_generic(
+        "Mode (Online/In-person): ",
+        lambda x: x.lower() in ['online', 'in-person']
+    )
+    if session_data['mode'].lower() == 'in-person':
+        session_data['location'] = system.get_valid_input_generic("Location: ", lambda x: len(x) > 0)
+    else:
+        session_data['online_link'] = system.get_valid_input_generic("Online meeting link: ", lambda x: len(x) > 0)
+    session_data['capacity'] = system.get_valid_input_generic(
+        "Maximum students per session (leave blank for no limit): ",
+        lambda x: x == '' or (x.isdigit() and int(x) > 0)
+    )
+
+    try:
+        # The tutor already agreed to skip overlapping dates
+        posted = services.post_series(
+            system, system.current_user_id, dates, every_days, skip_conflicts=True, **session_data
+        )
+        dates = posted['dates']
+        print(f"\nSeries {posted['series_id']} posted: {len(dates)} sessions from {dates[0]} to {dates[-1]}.")
+        if posted['skipped']:
+            print(f"{len(posted['skipped'])} date(s) were skipped because they overlap existing sessions.")
+
+    except ServiceError as e:
+        print(f"\n{e}")
+    except Error as e:
+        print(f"\nError posting series: {e}")
+
+def tutor_manage_series(system):
+    """Edit or cancel all upcoming sessions of one of the tutor's series"""
+    try:
+        tutor_series = services.tutor_series(system, system.current_user_id)
+    except Error as e:
+        print(f"\nError loading your series: {e}")
+        return
+
+    if not tutor_series:
+        print("\nYou have no series with upcoming sessions.")
+        return
+
+    print("\nYour Session Series:")
+    for row in tutor_series:
+        print(f"\nSeries ID: {row['series_id']} (every {row['every_days']} days)")
+        print(f"Subject: {row['subject']} - {row['topic']} | Time: {row['start_time']}-{row['end_time']}")
+        print(f"Upcoming sessions: {row['upcoming']} | Next: {row['next_date']}")
+
+    series_id = input("\nEnter Series ID (or 'cancel'): ").strip()
+    if series_id.lower() == 'cancel':
+        return
+    if series_id not in {row['series_id'] for row in tutor_series}:
+        print("Invalid Series ID or not your series")
+        return
+
+    print("\n1. Edit all upcoming sessions")
+    print("2. Cancel all upcoming sessions")
+    choice = input("Enter your choice (1-2): ").strip()
+
+    if choice == '2':
+        if input("Cancel every upcoming session of this series? Registered students lose their seats. (yes/no): ").lower() not in ['yes', 'y']:
+            return
+        try:
+            cancelled = services.cancel_series(system, system.current_user_id, series_id)
+            print(f"\nCancelled {len(cancelled)} session(s).")
+        except Error as e:
+            print(f"\nError cancelling series: {e}")
+        return
+    if choice != '1':
+        print("Invalid choice.")
+        return
+
+    print("\nUpdate Series (leave blank to keep current value)")
+    updates = {}
+    for field, prompt, validation in [
+        ('subject', 'Subject', lambda x: len(x) > 0),
+        ('topic', 'Topic', lambda x: len(x) > 0),
+        ('level', 'Level (Beginner/Intermediate/Advanced)', lambda x: x.lower() in ['beginner', 'intermediate', 'advanced']),
+        ('details', 'Details', None),
+        ('start_time', 'Start Time (HH:MM)', lambda x: len(x) == 5 and x[2] == ':'),
+        ('duration', 'Duration (minutes)', lambda x: x.isdigit() and 0 < int(x) <= MAX_DURATION),
+        ('capacity', 'Maximum students', lambda x: x.isdigit() and int(x) > 0),
+    ]:
+        new_val = input(f"{prompt}: ").strip()
+        if new_val:
+            if validation and not validation(new_val):
+                print(f"Invalid {field}, keeping current value")
+                continue
+            updates[field] = new_val
+
+    if not updates:
+        print("\nNo changes made.")
+        return
+
+    try:
+        session_ids = services.update_series(system, system.current_user_id, series_id, updates)
+        print(f"\nUpdated {len(session_ids)} upcoming session(s).")
+
+    except TimeConflict as e:
+        for _, existing in sorted(dict(e.conflicts).items()):
+            print_conflict(existing[0])
+        print(f"\n{e} Update cancelled.")
+    except ServiceError as e:
+        print(f"\n{e} Update cancelled.")
+    except Error as e:
+        print(f"\nError updating series: {e}")
 
 def tutor_view_requests(system):
     """Tutor views pending session requests with improved confirmation flow"""
-    print("\nPending Session Requests from Students:")
+    limit = system.get_valid_input_generic(
+        "How many of the best-matched requests to show? (blank for all): ",
+        lambda x: x == '' or (x.isdigit() and int(x) > 0),
+        "Please enter a positive number or leave blank"
+    )
+    limit = int(limit) if limit else None
 
     try:
-        cursor = system.connection.cursor(dictionary=True)
-
-        # Get pending requests with participant counts
-        cursor.execute('''
-            SELECT sr.request_id, sr.subject, sr.topic, sr.level, sr.details, 
-                   COUNT(rp.student_id) AS participant_count 
-            FROM session_requests sr 
-            LEFT JOIN request_participations rp ON sr.request_id = rp.request_id 
-            WHERE sr.status = 'pending' 
-            GROUP BY sr.request_id, sr.subject, sr.topic, sr.level, sr.details
-        ''')
+        # Requests matched to the subjects and levels this tutor teaches
+        pending_requests, matched = services.requests_for_tutor(system, system.current_user_id, limit)
 
-        pending_requests = cursor.fetchall()
+        if matched:
+            print("\nPending Session Requests matched to your subjects (best match first):")
+        else:
+            print("\nPending Session Requests from Students (most demanded first):")
+            print("Tip: add the subjects you teach under Manage Sessions to see requests matched to you.")
 
         if not pending_requests:
             print("No pending session requests.")
@@ -170,46 +320,48 @@ def tutor_view_requests(system):
             print(f"Level: {req['level']}")
             print(f"Requested by: {req['participant_count']} students")
             print(f"Details: {req['details']}")
+            if 'match_score' in req:
+                print(f"Match score: {req['match_score']}" + (" (adjacent level)" if req['level_fit'] < 1 else ""))
 
             confirm = input("\nWould you like to confirm this session? (yes/no): ").lower()
             if confirm == 'yes':
                 print("\nPlease provide the session details below:")
 
                 session_data = {
-                    "tutor_id": system.current_user_id,
-                    "subject": req['subject'],
-                    "topic": req['topic'],
-                    "level": req['level'],
-                    "details": req['details'],
-                    "date": system.get_valid_input_generic(
+                    "duration": int(system.get_valid_input_generic(
+                        "Duration (minutes): ", 
+                        lambda x: x.isdigit() and 0 < int(x) <= MAX_DURATION,
+                        f"Please enter a number of minutes between 1 and {MAX_DURATION}"
+                    ))
+                }
+
+                # Suggest times when most participants (and the tutor) are free
+                suggestion = _pick_suggested_slot(system, req, session_data['duration'])
+                if suggestion:
+                    session_data['date'] = suggestion['date']
+                    session_data['start_time'] = suggestion['start_time']
+                else:
+                    session_data['date'] = system.get_valid_input_generic(
                         "Date (YYYY-MM-DD): ", 
                         lambda x: len(x) == 10 and x[4] == '-' and x[7] == '-' and 
                                  datetime.datetime.strptime(x, "%Y-%m-%d") >= datetime.datetime.now(),
                         "Please enter a valid future date in YYYY-MM-DD format"
-                    ),
-                    "start_time": system.get_valid_input_generic(
+                    )
+                    session_data['start_time'] = system.get_valid_input_generic(
                         "Start Time (HH:MM): ", 
                         lambda x: len(x) == 5 and x[2] == ':',
                         "Please enter time in HH:MM format"
-                    ),
-                    "duration": int(system.get_valid_input_generic(
-                        "Duration (minutes): ", 
-                        lambda x: x.isdigit() and int(x) > 0,
-                        "Please enter a positive number"
-                    )),
-                    "mode": system.get_valid_input_generic(
-                        "Mode (1. Online / 2. In-person): ", 
-                        lambda x: x in ['1', '2'],
-                        "Please enter 1 or 2"
                     )
-                }
+
+                session_data['mode'] = system.get_valid_input_generic(
+                    "Mode (1. Online / 2. In-person): ", 
+                    lambda x: x in ['1', '2'],
+                    "Please enter 1 or 2"
+                )
 
                 # Convert mode selection
                 session_data['mode'] = 'Online' if session_data['mode'] == '1' else 'In-person'
 
-                # Calculate end time
-                session_data['end_time'] = system.calculate_end_time(session_data['start_time'], session_data['duration'])
-
                 # Get mode-specific details
                 if session_data['mode'] == 'In-person':
                     session_data['location'] = system.get_valid_input_generic(
@@ -217,14 +369,27 @@ def tutor_view_requests(system):
                         lambda x: len(x) > 0,
                         "Location cannot be empty"
                     )
-                    session_data['online_link'] = None
                 else:
                     session_data['online_link'] = system.get_valid_input_generic(
                         "Online meeting link: ", 
                         lambda x: len(x) > 0,
                         "Link cannot be empty"
                     )
-                    session_data['location'] = None
+
+                # Check the tutor's calendar before committing to the time
+                try:
+                    conflicts = services.tutor_conflicts(
+                        system, system.current_user_id, session_data['date'],
+                        session_data['start_time'], session_data['duration']
+                    )
+                except Error as e:
+                    print(f"Error checking for time conflicts: {e}")
+                    continue
+
+                if conflicts:
+                    print_conflict(conflicts[0])
+                    print("\nThis session overlaps with an existing session. Session confirmation cancelled.")
+                    continue
 
                 # Final confirmation
                 final_confirm = input("\nConfirm session? (yes/no): ").lower()
@@ -233,61 +398,47 @@ def tutor_view_requests(system):
                     continue
 
                 try:
-                    # Start transaction
-                    cursor.execute("START TRANSACTION")
-
-                    # Create the session
-                    session_id = system.generate_id('session')
-                    cursor.execute('''
-                        INSERT INTO sessions (
-                            session_id, tutor_id, subject, topic, level, details, 
-                            date, start_time, duration, end_time, mode, status, 
-                            from_request, request_id, location, online_link
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        session_id, session_data['tutor_id'], session_data['subject'],
-                        session_data['topic'], session_data['level'], session_data['details'],
-                        session_data['date'], session_data['start_time'], session_data['duration'],
-                        session_data['end_time'], session_data['mode'], 'active',
-                        True, req['request_id'], session_data['location'], session_data['online_link']
-                    ))
+                    result = services.fulfill_request(
+                        system, system.current_user_id, req['request_id'], **session_data
+                    )
 
-                    # Update request status
-                    cursor.execute('''
-                        UPDATE session_requests SET status = 'fulfilled' WHERE request_id = %s
-                    ''', (req['request_id'],))
-
-                    # Register all participating students
-                    cursor.execute('''
-                        SELECT student_id FROM request_participations WHERE request_id = %s
-                    ''', (req['request_id'],))
-                    participants = cursor.fetchall()
-
-                    for participant in participants:
-                        cursor.execute('''
-                            INSERT INTO registrations (
-                                student_id, session_id, registration_date, status
-                            ) VALUES (%s, %s, %s, %s)
-                        ''', (
-                            participant['student_id'], session_id,
-                            datetime.datetime.now().strftime("%Y-%m-%d"), "registered"
-                        ))
-
-                    system.connection.commit()
-                    print(f"\n✅ Session created successfully! Session ID: {session_id}")
-                    print(f"{len(participants)} students have been automatically registered.")
+                    print(f"\n✅ Session created successfully! Session ID: {result['session_id']}")
+                    print(f"{result['registered']} students have been automatically registered.")
 
+                except TimeConflict as e:
+                    print(f"\n{e} Please choose a different time.")
+                except ServiceError as e:
+                    print(f"\n{e}")
                 except Error as e:
-                    system.connection.rollback()
                     print(f"\nError creating session from request: {e}")
-                    if "unique_session_time" in str(e):
-                        print("A session already exists at this date and time. Please choose a different time.")
 
     except Error as e:
         print(f"\nError viewing requests: {e}")
-    finally:
-        cursor.close()
-        
+
+def _pick_suggested_slot(system, req, duration):
+    """Shows the best start times for a request and returns the one the tutor picks (or None)"""
+    try:
+        suggestions = services.suggest_times(system, system.current_user_id, req['request_id'], duration)
+    except Error as e:
+        print(f"Could not compute suggested times: {e}")
+        return None
+
+    if not suggestions:
+        print(f"\nNo free {duration}-minute slot in the next {slots.SUGGESTION_DAYS} days; please enter a time.")
+        return None
+
+    print(f"\nSuggested times (next {slots.SUGGESTION_DAYS} days, participants free):")
+    for idx, slot in enumerate(suggestions, 1):
+        print(f"{idx}. {slot['date']} {slot['start_time']}-{slot['end_time']} "
+              f"({slot['free']}/{slot['participants']} free)")
+
+    choice = system.get_valid_input_generic(
+        "Pick a suggestion number, or press Enter to type your own date and time: ",
+        lambda x: x == '' or (x.isdigit() and 1 <= int(x) <= len(suggestions)),
+        f"Please enter 1-{len(suggestions)} or leave blank"
+    )
+    return suggestions[int(choice) - 1] if choice else None
+
 def _update_session_with_id(system, session_id):
     """Helper method to update a specific session"""
     session = system.get_session_details(session_id)
@@ -298,11 +449,8 @@ def _update_session_with_id(system, session_id):
     updates = {}
     print("\nUpdate Session (leave blank to keep current value)")
 
-    # Convert time objects to strings for display
-    current_start_time = session['start_time'].strftime("%H:%M") if isinstance(session['start_time'],
-                                                                               datetime.time) else session['start_time']
-    current_end_time = session['end_time'].strftime("%H:%M") if isinstance(session['end_time'], datetime.time) else \
-    session['end_time']
+    # TIME columns come back as timedelta; show them as HH:MM
+    current_start_time = format_minutes(to_minutes(session['start_time']))
 
     fields = [
         ('subject', 'Subject', lambda x: len(x) > 0),
@@ -311,85 +459,51 @@ def _update_session_with_id(system, session_id):
         ('details', 'Details', None),
         ('date', 'Date (YYYY-MM-DD)', lambda x: len(x) == 10 and x[4] == '-' and x[7] == '-' and datetime.datetime.strptime(x, "%Y-%m-%d") >= datetime.datetime.now()),
         ('start_time', 'Start Time (HH:MM)', lambda x: len(x) == 5 and x[2] == ':'),
-        ('duration', 'Duration (minutes)', lambda x: x.isdigit() and int(x) > 0),
-        ('mode', 'Mode (Online/In-person)', lambda x: x.lower() in ['online', 'in-person'])
+        ('duration', 'Duration (minutes)', lambda x: x.isdigit() and 0 < int(x) <= MAX_DURATION),
+        ('mode', 'Mode (Online/In-person)', lambda x: x.lower() in ['online', 'in-person']),
+        # A capacity below the seats already taken would strand registered students
+        ('capacity', 'Maximum students', lambda x: x.isdigit() and int(x) >= max(session['registration_count'], 1))
     ]
 
     for field, prompt, validation in fields:
-        current = session[field]
-        # Handle special cases for time display
-        if field == 'start_time':
-            current = current_start_time
-        elif field == 'end_time':
-            current = current_end_time
+        current = current_start_time if field == 'start_time' else session[field]
 
         new_val = input(f"{prompt} [{current}]: ").strip()
         if new_val:
             if validation and not validation(new_val):
                 print(f"Invalid {field}, keeping current value")
                 continue
-            updates[field] = new_val.capitalize() if field == 'mode' or field == 'level' else new_val
-
-    # If time or duration changed, recalculate end time
-    if 'start_time' in updates or 'duration' in updates:
-        start_time = updates.get('start_time', current_start_time)
-        # Ensure we have the correct start_time format
-        if isinstance(start_time, datetime.time):
-            start_time = start_time.strftime("%H:%M")
-        duration = int(updates.get('duration', session['duration']))
-        updates['end_time'] = system.calculate_end_time(start_time, duration)
-
-    # Handle location/link based on mode
-    if 'mode' in updates or 'location' in updates or 'online_link' in updates:
-        mode = updates.get('mode', session['mode'])
-        if mode == 'In-person':
-            updates['location'] = input(f"Location [{session.get('location', '')}]: ").strip() or session.get('location', '')
-            updates['online_link'] = None
-        else:
-            updates['online_link'] = input(f"Online link [{session.get('online_link', '')}]: ").strip() or session.get('online_link', '')
-            updates['location'] = None
-
-    if updates:
-        try:
-            cursor = system.connection.cursor()
-            cursor.execute("START TRANSACTION")
+            updates[field] = new_val.capitalize() if field == 'mode' else new_val
 
-            # Record changes
-            for field, new_value in updates.items():
-                cursor.execute('''
-                    INSERT INTO session_updates (session_id, field_name, old_value, new_value) VALUES (%s, %s, %s, %s)
-                ''', (session_id, field, session[field], new_value))
-
-            # Build update query
-            set_clause = ', '.join([f"{field}=%s" for field in updates])
-            query = f"UPDATE sessions SET {set_clause} WHERE session_id=%s"
-            params = list(updates.values()) + [session_id]
-
-            cursor.execute(query, params)
-            system.connection.commit()
-            print("\nSession updated successfully!")
+    # Ask for the location or link that goes with the mode
+    if 'mode' in updates:
+        if updates['mode'] == 'In-person':
+            updates['location'] = input(f"Location [{session.get('location') or ''}]: ").strip() or session.get('location')
+        else:
+            updates['online_link'] = input(f"Online link [{session.get('online_link') or ''}]: ").strip() or session.get('online_link')
 
-        except Error as e:
-            system.connection.rollback()
-            if "unique_session_time" in str(e):
-                print("\nA session already exists at this date and time. Update cancelled.")
-            else:
-                print(f"\nError updating session: {e}")
-        finally:
-            cursor.close()
-    else:
+    if not updates:
         print("\nNo changes made.")
+        return
+
+    try:
+        diff = services.update_session(system, system.current_user_id, session_id, updates)
+        print("\nSession updated successfully!" if diff else "\nNo changes made.")
+
+    except TimeConflict as e:
+        if e.conflicts:
+            print_conflict(e.conflicts[0])
+        print(f"\n{e} Update cancelled.")
+    except ServiceError as e:
+        print(f"\n{e} Update cancelled.")
+    except Error as e:
+        print(f"\nError updating session: {e}")
 
 def tutor_update_session(system):
     """Improved session updating with session selection"""
     try:
         # First show scheduled sessions
-        cursor = system.connection.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT s.*, COUNT(r.student_id) AS registration_count FROM sessions s LEFT JOIN registrations r ON s.session_id = r.session_id AND r.status = 'registered' WHERE s.tutor_id = %s AND s.status = 'active' AND s.date >= CURDATE() GROUP BY s.session_id ORDER BY s.date, s.start_time
-        ''', (system.current_user_id,))
-
-        sessions = cursor.fetchall()
+        sessions = services.tutor_sessions(system, system.current_user_id)
 
         if not sessions:
             print("\nYou have no sessions to update.")
@@ -405,7 +519,8 @@ def tutor_update_session(system):
                 print(f"Location: {session['location']}")
             else:
                 print(f"Online Link: {session['online_link']}")
-            print(f"Students registered: {session['registration_count']}")
+            print(f"Students registered: {session['registration_count']}"
+                  + (f" / {session['capacity']}" if session['capacity'] is not None else ""))
             print(f"Details: {session['details']}")
 
         # Get session ID to update
@@ -417,27 +532,125 @@ def tutor_update_session(system):
 
     except Error as e:
         print(f"\nError retrieving session: {e}")
-    finally:
-        cursor.close()
 
 def tutor_manage_sessions(system):
     """Nested session management menu"""
     while True:
         print("\nManage Sessions")
         print("1. Post New Session")
-        print("2. View/Respond to Student Requests")
-        print("3. Update Scheduled Sessions")
-        print("4. Back to Main Menu")
+        print("2. Post Recurring Session Series")
+        print("3. View/Respond to Student Requests")
+        print("4. Update Scheduled Sessions")
+        print("5. Edit/Cancel a Session Series")
+        print("6. Manage My Subjects")
+        print("7. View a Session's Change History")
+        print("8. Back to Main Menu")
 
-        choice = input("Enter your choice (1-4): ")
+        choice = input("Enter your choice (1-8): ")
 
         if choice == '1':
             tutor_post_session(system)
         elif choice == '2':
-            tutor_view_requests(system)
+            tutor_post_series(system)
         elif choice == '3':
-            tutor_update_session(system)
+            tutor_view_requests(system)
         elif choice == '4':
+            tutor_update_session(system)
+        elif choice == '5':
+            tutor_manage_series(system)
+        elif choice == '6':
+            tutor_manage_subjects(system)
+        elif choice == '7':
+            tutor_view_session_history(system)
+        elif choice == '8':
+            break
+        else:
+            print("Invalid choice. Please try again.")
+
+def tutor_view_session_history(system):
+    """Shows every recorded edit of one of the tutor's sessions and, optionally, how it looked at a past time"""
+    session_id = input("\nEnter Session ID (or 'cancel'): ").strip()
+    if session_id.lower() == 'cancel':
+        return
+
+    try:
+        history = services.session_history(system, system.current_user_id, session_id)
+        if not history:
+            print("\nThis session has not been edited since it was posted.")
+            return
+
+        print(f"\nChange History of {session_id}:")
+        for entry in history:
+            print(f"\n{entry['changed_at']}")
+            for field, (old, new) in entry['changes'].items():
+                print(f"  {field}: {old} -> {new}")
+
+        when = input("\nShow the session as it was at (YYYY-MM-DD HH:MM, blank to skip): ").strip()
+        if not when:
+            return
+        try:
+            when = datetime.datetime.strptime(when, "%Y-%m-%d %H:%M")
+        except ValueError:
+            print("Invalid date and time.")
+            return
+
+        session = services.session_as_of(system, system.current_user_id, session_id, when)
+        print(f"\nSession as of {when}:")
+        for field in services.SESSION_FIELDS:
+            print(f"  {field}: {session.get(field)}")
+
+    except ServiceError as e:
+        print(f"\n{e}")
+    except Error as e:
+        print(f"\nError reading session history: {e}")
+
+def tutor_manage_subjects(system):
+    """Lets the tutor record the subjects and levels they teach, used to match requests"""
+    while True:
+        try:
+            expertise = services.tutor_subjects(system, system.current_user_id)
+        except Error as e:
+            print(f"\nError loading your subjects: {e}")
+            return
+
+        print("\nSubjects You Teach")
+        if not expertise:
+            print("None recorded yet.")
+        for idx, (subject, level) in enumerate(expertise, 1):
+            print(f"{idx}. {subject} ({level})")
+
+        print("\n1. Add a subject")
+        print("2. Remove a subject")
+        print("3. Back")
+        choice = input("Enter your choice (1-3): ").strip()
+
+        if choice == '1':
+            subject = system.get_valid_input_generic("Subject: ", lambda x: len(x) > 0)
+            levels = system.get_valid_input_generic(
+                "Levels (comma separated Beginner/Intermediate/Advanced, or 'all'): ",
+                lambda x: x.lower() == 'all' or all(
+                    level.strip().lower() in ['beginner', 'intermediate', 'advanced'] for level in x.split(',')
+                ),
+                "Please enter Beginner, Intermediate, Advanced (comma separated) or 'all'"
+            )
+            levels = services.LEVELS if levels.lower() == 'all' else levels.split(',')
+            try:
+                levels = services.add_subject(system, system.current_user_id, subject, levels)
+                print(f"Added {' '.join(subject.split())} ({', '.join(levels)}).")
+            except (ServiceError, Error) as e:
+                print(f"Error adding subject: {e}")
+        elif choice == '2':
+            number = input("Number to remove: ").strip()
+            if not number.isdigit() or not 1 <= int(number) <= len(expertise):
+                print("Invalid number.")
+                continue
+            subject, level = expertise[int(number) - 1]
+            try:
+                services.remove_subject(system, system.current_user_id, subject, level)
+                print(f"Removed {subject} ({level}).")
+            except Error as e:
+                print(f"Error removing subject: {e}")
+        elif choice == '3':
             break
         else:
             print("Invalid choice. Please try again.")
@@ -445,12 +658,7 @@ def tutor_manage_sessions(system):
 def tutor_view_scheduled_simple(system):
     """Simplified view of scheduled sessions (read-only)"""
     try:
-        cursor = system.connection.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT s.*, COUNT(r.student_id) AS registration_count FROM sessions s LEFT JOIN registrations r ON s.session_id = r.session_id AND r.status = 'registered' WHERE s.tutor_id = %s AND s.status = 'active' AND s.date >= CURDATE() GROUP BY s.session_id ORDER BY s.date, s.start_time
-        ''', (system.current_user_id,))
-
-        sessions = cursor.fetchall()
+        sessions = services.tutor_sessions(system, system.current_user_id)
 
         if not sessions:
             print("\nYou have no scheduled sessions.")
@@ -469,9 +677,24 @@ def tutor_view_scheduled_simple(system):
             else:
                 print(f"Mode: In-person | Location: {session['location']}")
 
-            print(f"Students registered: {session['registration_count']}")
+            print(f"Students registered: {session['registration_count']}"
+                  + (f" / {session['capacity']}" if session['capacity'] is not None else ""))
 
     except Error as e:
         print(f"\nError viewing sessions: {e}")
-    finally:
-        cursor.close()
\ No newline at end of file
+
+def tutor_view_past_sessions(system):
+    """Read-only view of the tutor's most recent past sessions, including archived ones"""
+    try:
+        sessions = services.past_sessions_for_tutor(system, system.current_user_id)
+
+        if not sessions:
+            print("\nYou have no past sessions.")
+            return
+
+        print(f"\nYour Past Sessions (latest {len(sessions)}):")
+        for session in sessions:
+            archive.print_past_session(session)
+
+    except Error as e:
+        print(f"\nError viewing past sessions: {e}")